@@ -2,15 +2,14 @@
 Minimax Izvod Konvertor
 =======================
 Automatski pretvara PDF izvode u Minimax Excel sa BEX razbijanjem.
+
+Streamlit UI only - parsing, BEX expansion and exports live in the
+minimax package (also usable headless: python -m minimax).
 """
 
 import streamlit as st
-import io
-import re
-import json
-from pathlib import Path
-import anthropic
-from openpyxl import Workbook
+
+from minimax import config
 
 # Page config
 st.set_page_config(page_title="Minimax Izvod", page_icon="🏦", layout="wide")
@@ -18,7 +17,8 @@ st.set_page_config(page_title="Minimax Izvod", page_icon="🏦", layout="wide")
 # ========================================================================
 # LOAD API KEY FIRST
 # ========================================================================
-API_KEY = st.secrets.get("ANTHROPIC_API_KEY", "")
+# Secrets override env defaults (ANTHROPIC_API_KEY, MAX_WORKERS, CACHE_DIR, ...)
+config.load(st.secrets)
 
 # ========================================================================
 # PASSWORD PROTECTION
@@ -51,6 +51,23 @@ if not st.session_state.authenticated:
 # ========================================================================
 # MAIN APP (only accessible after authentication)
 # ========================================================================
+# Imported only now, so the login screen paints without loading the
+# pipeline; after the first run these are sys.modules lookups
+from minimax import jobs, store
+from minimax.cache import cache_clear
+from minimax.export import format_account_number
+from minimax.pipeline import OUTPUT_FORMATS, output_filename
+from ui import (
+    KEPT_RUNS,
+    conversion_work,
+    download_data,
+    show_job_progress,
+    show_ledger_panel,
+    show_metrics_panel,
+    show_session_memory,
+    store_session,
+    uploads_key,
+)
 
 # Custom CSS
 st.markdown("""<style>
@@ -63,506 +80,41 @@ st.markdown("""<style>
 st.markdown('<h1 class="main-title">🏦 Minimax Izvod Konvertor</h1>', unsafe_allow_html=True)
 st.markdown('<p class="subtitle">PDF izvodi → Excel sa razbijenim BEX kupcima</p>', unsafe_allow_html=True)
 
-# Helper functions
-def extract_text_from_pdf(pdf_bytes):
-    """Extract text from PDF (supports both regular PDF and ZIP format)."""
-    try:
-        import pdfplumber
-        with pdfplumber.open(io.BytesIO(pdf_bytes)) as pdf:
-            text = ""
-            for page in pdf.pages:
-                text += page.extract_text() + "\n\n"
-        return text
-    except:
-        # Try as ZIP
-        import zipfile
-        if pdf_bytes[:2] == b"PK":
-            with zipfile.ZipFile(io.BytesIO(pdf_bytes)) as z:
-                txt_files = sorted([n for n in z.namelist() if n.endswith('.txt')])
-                text = ""
-                for tf in txt_files:
-                    text += z.read(tf).decode('utf-8', errors='replace') + "\n\n"
-                return text
-        return pdf_bytes.decode('utf-8', errors='replace')
-
-def parse_xml_izvod(xml_bytes, filename):
-    """
-    Parse XML izvod (alternative to PDF izvod).
-    
-    Returns same format as parse_with_claude() for compatibility.
-    """
-    import xml.etree.ElementTree as ET
-    
-    try:
-        tree = ET.parse(io.BytesIO(xml_bytes))
-        root = tree.getroot()
-        
-        # Extract statement info from Zaglavlje
-        zaglavlje = root.find('Zaglavlje')
-        if zaglavlje is None:
-            raise ValueError("XML nema Zaglavlje element")
-        
-        statement = {
-            'date': zaglavlje.get('DatumIzvoda', ''),
-            'account': zaglavlje.get('Partija', ''),
-            'number': zaglavlje.get('BrojIzvoda', ''),
-            'owner_name': zaglavlje.get('KomitentNaziv', ''),
-            'owner_address': zaglavlje.get('KomitentAdresa', ''),
-            'tax_number': zaglavlje.get('MaticniBroj', '')
-        }
-        
-        # Extract transactions from Stavke elements
-        transactions = []
-        for stavka in root.findall('Stavke'):
-            debit = float(stavka.get('Duguje', '0') or '0')
-            credit = float(stavka.get('Potrazuje', '0') or '0')
-            
-            transactions.append({
-                'date': stavka.get('DatumValute', ''),
-                'customer_name': stavka.get('NalogKorisnik', ''),
-                'customer_address': stavka.get('Mesto', ''),
-                'customer_account': stavka.get('BrojRacunaPrimaocaPosiljaoca', ''),
-                'customer_tax_number': '',
-                'reference': stavka.get('PozivNaBrojKorisnika', '') or stavka.get('Referenca', ''),
-                'currency': 'RSD',
-                'debit': debit,
-                'credit': credit,
-                'description': stavka.get('Opis', '')
-            })
-        
-        return {
-            'statement': statement,
-            'transactions': transactions
-        }
-        
-    except Exception as e:
-        raise ValueError(f"XML parsing greška: {str(e)}")
-
-def format_account_number(account_str):
-    """Format account to XXX-XXXXXXXXXXXXX-XX if needed."""
-    # Remove all non-digits
-    digits = re.sub(r'\D', '', str(account_str))
-    
-    # If 18 digits, format as 3-13-2
-    if len(digits) == 18:
-        return f"{digits[:3]}-{digits[3:16]}-{digits[16:]}"
-    
-    # If already has dashes, keep as is
-    if '-' in str(account_str):
-        return str(account_str)
-    
-    return str(account_str)
-
-def parse_bex_specification(file_bytes, filename):
-    """
-    Parse BEX specification - supports both CSV and PDF formats.
-    
-    CSV: Direct parsing (instant, 100% accuracy)
-    PDF: Claude AI parsing (like izvod parsing, ~95-98% accuracy)
-    """
-    
-    # ========================================================================
-    # CSV FORMAT (Instant parsing)
-    # ========================================================================
-    if filename.lower().endswith('.csv'):
-        try:
-            import pandas as pd
-            df = pd.read_csv(io.BytesIO(file_bytes))
-            
-            customers = []
-            for _, row in df.iterrows():
-                # Column mapping for BEX CSV format
-                # IdPosiljke, DatumNaplateOtkupnine, UplatilacNaziv, UplatilacMesto, UplacenoOtkupa
-                posiljka = str(row.get('IdPosiljke', row.iloc[0] if len(row) > 0 else '')).strip()
-                name = str(row.get('UplatilacNaziv', row.iloc[3] if len(row) > 3 else '')).strip()
-                address = str(row.get('UplatilacMesto', row.iloc[4] if len(row) > 4 else '')).strip()
-                
-                # Parse amount (handle comma as decimal separator)
-                amount_str = str(row.get('UplacenoOtkupa', row.iloc[5] if len(row) > 5 else '0'))
-                amount = float(amount_str.replace(',', '').replace('.', ''))
-                
-                # Parse date
-                date_str = str(row.get('DatumNaplateOtkupnine', row.iloc[2] if len(row) > 2 else ''))
-                # Convert from "17.02.2026 00:00:00" to "17.02.2026"
-                date = date_str.split()[0] if ' ' in date_str else date_str
-                
-                if posiljka and name and amount > 0:
-                    customers.append({
-                        'name': name,
-                        'address': address,
-                        'amount': amount,
-                        'posiljka': posiljka,
-                        'reference': f'OT-{posiljka}',
-                        'date': date
-                    })
-            
-            return customers
-            
-        except Exception as e:
-            st.error(f"CSV parsing greška: {str(e)}")
-            return []
-    
-    # ========================================================================
-    # PDF FORMAT (AI parsing with Claude)
-    # ========================================================================
-    else:
-        try:
-            # Extract text from PDF
-            text = extract_text_from_pdf(file_bytes)
-            
-            # Use Claude AI to parse BEX specification (like we do for izvod)
-            if not API_KEY:
-                st.error("API key nije konfigurisan za PDF parsiranje!")
-                return []
-            
-            client = anthropic.Anthropic(api_key=API_KEY)
-            
-            prompt = f"""Analiziraj BEX Express specifikaciju i izvuci podatke o kupcima.
-
-TEKST SPECIFIKACIJE:
-{text}
-
-Vrati SAMO JSON (bez markdown):
-
-{{
-  "customers": [
-    {{
-      "posiljka": "262598547",
-      "name": "MILEV JOVAN",
-      "address": "PIROT, OBILIĆEVA 3",
-      "amount": 11400,
-      "date": "18.02.2026"
-    }},
-    ...
-  ]
-}}
-
-KRITIČNO VAŽNA PRAVILA ZA IZNOSE:
-1. Iznos je u koloni "Iznos" u PDF-u
-2. Format iznosa u PDF-u: 11,400 ili 2,050 ili 23,093
-3. UKLONI SVE ZAREZE iz iznosa: 11,400 → 11400
-4. NIKAD ne dodavaj nule: ako piše 11,400 to je 11400 dinara, NE 114000!
-5. Ako iznos ima 2 decimale (11,40), zadrži ih: 11,40 → 1140
-6. Proveri: suma svih iznosa mora biti realna (ispod 1,000,000 RSD po specifikaciji)
-
-OSTALA PRAVILA:
-- posiljka = 9-cifreni broj pošiljke (Br.pošiljke kolona)
-- name = Ime i prezime uplatilca TAČNO kao što piše (VELIKA SLOVA)
-- address = Adresa TAČNO kao što piše
-- date = Datum naplate (D.naplate kolona) u formatu DD.MM.YYYY
-- NIKAD ne izmišljaj podatke
-- Izvuci SVE redove iz tabele"""
-            
-            msg = client.messages.create(
-                model="claude-sonnet-4-20250514",
-                max_tokens=4096,
-                messages=[{"role": "user", "content": prompt}]
-            )
-            
-            raw = msg.content[0].text
-            clean = raw.replace('```json', '').replace('```', '').strip()
-            data = json.loads(clean)
-            
-            customers = []
-            for c in data.get('customers', []):
-                customers.append({
-                    'name': c.get('name', ''),
-                    'address': c.get('address', ''),
-                    'amount': float(c.get('amount', 0)),
-                    'posiljka': str(c.get('posiljka', '')),
-                    'reference': f"OT-{c.get('posiljka', '')}",
-                    'date': c.get('date', '')
-                })
-            
-            return customers
-            
-        except Exception as e:
-            st.error(f"PDF parsing greška: {str(e)}")
-            return []
-
-def parse_with_claude(text, filename):
-    """Parse izvod using Claude API."""
-    if not API_KEY:
-        raise ValueError("ANTHROPIC_API_KEY nije konfigurisan!")
-    
-    client = anthropic.Anthropic(api_key=API_KEY)
-    
-    prompt = f"""Analiziraj izvod banke i izvuci podatke u JSON formatu.
-
-TEKST IZVODA:
-{text}
-
-NAZIV FAJLA: {filename}
-
-Vrati SAMO JSON (bez markdown):
-
-{{
-  "statement": {{
-    "date": "DD.MM.YYYY",
-    "account": "broj-racuna-SA-SVIM-NULAMA-bez-crtica",
-    "number": "broj_izvoda",
-    "owner_name": "ime vlasnika",
-    "owner_address": "adresa",
-    "tax_number": "PIB"
-  }},
-  "transactions": [
-    {{
-      "date": "DD.MM.YYYY",
-      "customer_name": "naziv",
-      "customer_address": "adresa",
-      "customer_account": "racun-bez-crtica",
-      "customer_tax_number": "",
-      "reference": "referenca",
-      "currency": "RSD",
-      "debit": 0.00,
-      "credit": 0.00,
-      "description": "opis"
-    }}
-  ]
-}}
-
-PRAVILA:
-- debit = IZLAZI (pozitivan, credit=0)
-- credit = ULAZI (pozitivan, debit=0)
-- Račune vrati BEZ crtica (samo cifre)
-- NIKAD ne skraćuj nule u brojevima
-- date format: DD.MM.YYYY
-- Ignoriši ukupne sume"""
-    
-    msg = client.messages.create(
-        model="claude-sonnet-4-20250514",
-        max_tokens=2048,
-        messages=[{"role": "user", "content": prompt}]
-    )
-    
-    raw = msg.content[0].text
-    clean = raw.replace('```json', '').replace('```', '').strip()
-    return json.loads(clean)
-
-def expand_bex_transactions(transactions, specifications):
-    """Expand BEX transactions using specifications."""
-    expanded = []
-    
-    for tx in transactions:
-        is_bex = 'BEX' in (tx.get('customer_name', '') or '').upper()
-        
-        if is_bex:
-            tx_amount = tx.get('credit', 0) or tx.get('debit', 0)
-            
-            # Find matching spec
-            matched = None
-            for spec_name, customers in specifications.items():
-                spec_total = sum(c['amount'] for c in customers)
-                if abs(spec_total - tx_amount) < 0.01:
-                    matched = customers
-                    st.success(f"🔄 Razbijam BEX: {len(customers)} kupaca")
-                    break
-            
-            if matched:
-                for c in matched:
-                    expanded.append({
-                        'date': c['date'],
-                        'customer_name': c['name'],
-                        'customer_address': c['address'],
-                        'customer_account': '',
-                        'customer_tax_number': '',
-                        'reference': c['reference'],
-                        'currency': 'RSD',
-                        'debit': 0,  # BEX customers are always CREDIT (income)
-                        'credit': c['amount'],
-                        'description': f"Otkup pošiljke {c['posiljka']}"
-                    })
-            else:
-                expanded.append(tx)
-        else:
-            expanded.append(tx)
-    
-    return expanded
-
-def fix_debit_credit_logic(transactions, owner_account):
-    """
-    Fix debit/credit based on logic:
-    - BEX customers (income from courier) → CREDIT (money IN)
-    - Payments to suppliers/banks → DEBIT (money OUT)
-    - Transfers from own account → CREDIT (money IN)
-    """
-    owner_account_clean = owner_account.replace('-', '')
-    fixed = []
-    
-    for tx in transactions:
-        cust_account = (tx.get('customer_account', '') or '').replace('-', '')
-        cust_name = (tx.get('customer_name', '') or '').upper()
-        description = (tx.get('description', '') or '').upper()
-        
-        # Check if this is incoming or outgoing
-        is_incoming = False
-        
-        # CRITICAL RULE 1: BEX customers are ALWAYS incoming (we collected money)
-        # Indicators: customer names from BEX specs, or "OTKUP POŠILJKE" in description
-        if any(x in description for x in ['OTKUP', 'POŠILJKE', 'POSILJKE']):
-            is_incoming = True
-        elif any(x in cust_name for x in ['ŠABLJOV', 'SEKE', 'PAVLOVIĆ', 'MILEV', 'JOVANOVIĆ', 'MANOJLOVIĆ']):
-            is_incoming = True
-        elif 'OT-' in tx.get('reference', ''):  # BEX reference format
-            is_incoming = True
-        
-        # Rule 2: Account matches owner = incoming transfer
-        elif cust_account and cust_account == owner_account_clean:
-            is_incoming = True
-        
-        # Rule 3: Company name in customer = internal/outgoing
-        elif 'MG AUTO' in cust_name or 'MLADEN GRUJOSKI' in cust_name:
-            is_incoming = False
-        
-        # Rule 4: Banks, taxes, suppliers = outgoing payments
-        elif any(x in cust_name for x in ['RAIFFEISEN', 'UNICREDIT', 'NLB', 'PORESKA', 'GBG', 'BIZ KONCEPT', 'BOŽIDAR']):
-            is_incoming = False
-        
-        # Rule 5: If both debit and credit are already set correctly, keep as is
-        elif tx.get('debit', 0) > 0 and tx.get('credit', 0) > 0:
-            fixed.append(tx)
-            continue
-        
-        # Apply fix
-        amount = tx.get('credit', 0) or tx.get('debit', 0)
-        
-        if is_incoming:
-            tx['debit'] = 0
-            tx['credit'] = amount
-        else:
-            tx['debit'] = amount
-            tx['credit'] = 0
-        
-        fixed.append(tx)
-    
-    return fixed
-
-def create_minimax_excel(statement, transactions):
-    """Generate Minimax Excel with correct formatting."""
-    wb = Workbook()
-    
-    # Format account number
-    account = format_account_number(statement.get('account', ''))
-    
-    # Sheet 1: Statement
-    ws1 = wb.active
-    ws1.title = "Statement"
-    ws1.append(["Date", "Account", "Number"])
-    ws1.append([statement.get('date', ''), account, statement.get('number', '')])
-    
-    for row in ws1.iter_rows():
-        for cell in row:
-            cell.number_format = "@"
-    
-    ws1.column_dimensions["A"].width = 15
-    ws1.column_dimensions["B"].width = 32
-    ws1.column_dimensions["C"].width = 10
-    
-    # Sheet 2: Transactions
-    ws2 = wb.create_sheet("Transactions")
-    headers = ["CustomerName","CustomerAddress","CustomerAccount","CustomerTaxNumber",
-               "Date","Reference","Currency","Debit","Credit","Description"]
-    ws2.append(headers)
-    
-    for tx in transactions:
-        # Format customer account if present
-        cust_account = format_account_number(tx.get('customer_account', '')) if tx.get('customer_account') else ''
-        
-        ws2.append([
-            str(tx.get("customer_name", "") or ""),
-            str(tx.get("customer_address", "") or ""),
-            cust_account,
-            str(tx.get("customer_tax_number", "") or ""),
-            str(tx.get("date", "") or ""),
-            str(tx.get("reference", "") or ""),
-            "RSD",
-            float(tx.get("debit", 0) or 0),
-            float(tx.get("credit", 0) or 0),
-            str(tx.get("description", "") or ""),
-        ])
-    
-    # Format numbers
-    num_cols = {8, 9}
-    for row in ws2.iter_rows():
-        for cell in row:
-            if cell.column in num_cols:
-                cell.number_format = "0.00"
-            else:
-                cell.number_format = "@"
-    
-    # Column widths
-    col_widths = [35, 25, 28, 15, 12, 25, 8, 12, 12, 45]
-    for i, width in enumerate(col_widths, 1):
-        ws2.column_dimensions[ws2.cell(1, i).column_letter].width = width
-    
-    # Save to bytes
-    output = io.BytesIO()
-    wb.save(output)
-    output.seek(0)
-    return output.getvalue()
-
-def create_minimax_xml(statement, transactions):
-    """Generate Minimax XML (100% accurate, no AI needed for structure)."""
-    import xml.etree.ElementTree as ET
-    
-    # Format account
-    account = format_account_number(statement.get('account', ''))
-    account_no_dashes = account.replace('-', '')
-    
-    # Calculate totals
-    dugovni = sum(float(tx.get('debit', 0) or 0) for tx in transactions)
-    potrazni = sum(float(tx.get('credit', 0) or 0) for tx in transactions)
-    
-    # Root
-    root = ET.Element('TransakcioniRacunPrivredaIzvod')
-    
-    # Zaglavlje
-    zaglavlje = ET.SubElement(root, 'Zaglavlje')
-    zaglavlje.set('VrstaIzvoda', 'R')
-    zaglavlje.set('BrojIzvoda', statement.get('number', ''))
-    zaglavlje.set('DatumIzvoda', statement.get('date', ''))
-    zaglavlje.set('MaticniBroj', '4167520394')
-    zaglavlje.set('KomitentNaziv', statement.get('owner_name', ''))
-    zaglavlje.set('KomitentAdresa', statement.get('owner_address', ''))
-    zaglavlje.set('KomitentMesto', '11010 BEOGRAD-VOŽDOVAC')
-    zaglavlje.set('Partija', account_no_dashes)
-    zaglavlje.set('TipRacuna', 'Transakcioni depoziti preduzetnika')
-    zaglavlje.set('PrethodnoStanje', f"{dugovni + potrazni:.2f}")  # Simplified
-    zaglavlje.set('DugovniPromet', f"{dugovni:.2f}")
-    zaglavlje.set('PotrazniPromet', f"{potrazni:.2f}")
-    zaglavlje.set('NovoStanje', f"{potrazni - dugovni:.2f}")
-    zaglavlje.set('StanjeObracunateProvizije', '0')
-    
-    # Stavke (transactions)
-    for tx in transactions:
-        cust_account = format_account_number(tx.get('customer_account', '')) if tx.get('customer_account') else ''
-        
-        stavka = ET.SubElement(root, 'Stavke')
-        stavka.set('NalogKorisnik', str(tx.get('customer_name', '') or ''))
-        stavka.set('Mesto', str(tx.get('customer_address', '') or ''))
-        stavka.set('VasBrojNaloga', '')
-        stavka.set('BrojRacunaPrimaocaPosiljaoca', cust_account)
-        stavka.set('Opis', str(tx.get('description', '') or ''))
-        stavka.set('SifraPlacanja', '')
-        stavka.set('SifraPlacanjaOpis', '')
-        stavka.set('Duguje', f"{float(tx.get('debit', 0) or 0):.2f}")
-        stavka.set('Potrazuje', f"{float(tx.get('credit', 0) or 0):.2f}")
-        stavka.set('ModelZaduzenjaOdobrenja', '')
-        stavka.set('PozivNaBrojZaduzenjaOdobrenja', '')
-        stavka.set('ModelKorisnika', '')
-        stavka.set('PozivNaBrojKorisnika', str(tx.get('reference', '') or ''))
-        stavka.set('BrojZaReklamaciju', '')
-        stavka.set('Referenca', str(tx.get('reference', '') or ''))
-        stavka.set('Objasnjenje', '')
-        stavka.set('DatumValute', str(tx.get('date', '') or ''))
-    
-    # Convert to bytes
-    tree = ET.ElementTree(root)
-    ET.indent(tree, space="  ", level=0)
-    output = io.BytesIO()
-    tree.write(output, encoding='utf-8', xml_declaration=True)
-    output.seek(0)
-    return output.getvalue()
+# Converted izvodi are kept in session state per input identity, so
+# download clicks and expanders (which rerun the script) never reprocess,
+# and switching between Excel and XML only renders the other file.
+# Conversions run as background jobs (minimax.jobs); a job's results move
+# into runs once it is done.
+if 'runs' not in st.session_state:
+    st.session_state.runs = {}
+    st.session_state.pending_jobs = {}  # inputs key -> id of its job
+    
+    # New session, e.g. a reloaded page: pick up the job from the link -
+    # running, or finished with results no session has taken yet - with the
+    # store session its files are in
+    job = jobs.get(st.query_params.get('job', ''))
+    if job is not None and (job.active or job.results):
+        st.session_state.store_session = job.user
+        st.session_state.pending_jobs[job.data['inputs_key']] = job.id
+        st.session_state.last_run = st.session_state.reloaded_run = job.data['inputs_key']
+        st.session_state.output_format = job.data['output_format']
+
+runs = st.session_state.runs
+pending_jobs = st.session_state.pending_jobs
+
+for key, job_id in list(pending_jobs.items()):
+    job = jobs.get(job_id)
+    if job is None or job.status == 'failed':
+        del pending_jobs[key]
+        st.error(f"❌ Obrada nije uspela: {job.error if job else 'rezultat je istekao'}")
+    elif job.status == 'done':
+        del pending_jobs[key]
+        runs[key] = {'results': job.results, 'metrics': job.metrics, 'messages': job.messages}
+        # The session holds them now - the job would keep them in memory past
+        # KEPT_RUNS, until it expires
+        job.results = []
+        while len(runs) > KEPT_RUNS:
+            store.discard(runs.pop(next(iter(runs)))['results'])
 
 # Main UI
 col1, col2 = st.columns(2)
@@ -597,148 +149,177 @@ if izvodi_files:
     with col_btn2:
         generate_xml = st.button("📄 Generiši XML", type="secondary", use_container_width=True)
     
+    with st.expander("⚙️ Podešavanja"):
+        max_workers = st.slider(
+            "Broj izvoda koji se obrađuju istovremeno",
+            min_value=1, max_value=16, value=min(max(config.MAX_WORKERS, 1), 16)
+        )
+        use_cache = st.checkbox(
+            "Koristi keš AI rezultata (već parsirani fajlovi se ne šalju ponovo)",
+            value=True
+        )
+        chunked = st.checkbox(
+            f"Deli duge PDF izvode na delove od {config.CHUNK_PAGES} strana (paralelno parsiranje)",
+            value=config.CHUNK_PAGES > 0
+        )
+        streaming = st.checkbox(
+            "Prikazuj transakcije dok ih AI čita (streaming)",
+            value=True
+        )
+        batch_mode = st.checkbox(
+            "Batch mod - svi AI zahtevi u jednom paketu (upola jeftinije, rezultat za "
+            "nekoliko minuta do 24h; za obradu celog meseca)",
+            value=False
+        )
+        use_ledger = st.checkbox(
+            "Preskoči već obrađene izvode (učitaj ih iz baze umesto ponovne obrade)",
+            value=bool(config.LEDGER_PATH), disabled=not config.LEDGER_PATH
+        )
+        if st.button("🗑️ Obriši keš"):
+            removed = cache_clear()
+            # Kept runs were built from the cleared results - convert again
+            for run in runs.values():
+                store.discard(run['results'])
+            runs.clear()
+            st.success(f"Keš obrisan ({removed} stavki)")
+    
+    inputs_key = uploads_key(izvodi_files, spec_files, chunked, use_ledger, use_cache, batch_mode)
+    
     if generate_excel or generate_xml:
-        output_format = "Excel" if generate_excel else "XML"
-        st.info(f"Generišem {output_format} format...")
-        
-        # Parse BEX specs first
-        specifications = {}
-        
-        if spec_files:
-            with st.spinner("Parsiram BEX specifikacije..."):
-                for spec_file in spec_files:
-                    try:
-                        spec_bytes = spec_file.read()
-                        
-                        # Parse based on file extension (CSV or PDF)
-                        customers = parse_bex_specification(spec_bytes, spec_file.name)
-                        
-                        if customers:
-                            specifications[spec_file.name] = customers
-                            total = sum(c['amount'] for c in customers)
-                            st.success(f"✅ {spec_file.name}: {len(customers)} kupaca, {total:,.2f} RSD")
-                    except Exception as e:
-                        st.error(f"❌ {spec_file.name}: {str(e)}")
+        st.session_state.output_format = "Excel" if generate_excel else "XML"
         
-        # Process izvodi
-        progress_bar = st.progress(0)
-        results = []
-        
-        for i, izvod_file in enumerate(izvodi_files):
-            progress_bar.progress((i + 1) / len(izvodi_files))
-            
+        if inputs_key not in runs and inputs_key not in pending_jobs:
+            # Read uploads up front - UploadedFile objects stay in this thread
+            all_uploads = [(f.name, f.getvalue()) for f in izvodi_files]
+            spec_uploads = [(f.name, f.getvalue()) for f in spec_files or []]
+            session_id = store_session()
+            work = conversion_work(
+                all_uploads, spec_uploads, session_id, st.session_state.output_format,
+                streaming, max_workers=max_workers,
+                use_cache=use_cache, chunked=chunked, use_ledger=use_ledger, batch=batch_mode
+            )
             try:
-                with st.status(f"Obradjujem: {izvod_file.name}"):
-                    # Extract
-                    st.write("Citam fajl...")
-                    pdf_bytes = izvod_file.read()
-                    
-                    # Detect format: XML or PDF
-                    if izvod_file.name.lower().endswith('.xml'):
-                        st.write("Parsiram XML izvod...")
-                        parsed = parse_xml_izvod(pdf_bytes, izvod_file.name)
-                    else:
-                        # PDF format - extract and AI parse
-                        text = extract_text_from_pdf(pdf_bytes)
-                        st.write("AI parsiranje PDF izvoda...")
-                        parsed = parse_with_claude(text, izvod_file.name)
-                    
-                    # Expand BEX
-                    st.write("Proveravam BEX...")
-                    original_count = len(parsed['transactions'])
-                    expanded = expand_bex_transactions(parsed['transactions'], specifications)
-                    
-                    # Fix debit/credit logic
-                    st.write("Proveravam debit/credit...")
-                    expanded = fix_debit_credit_logic(expanded, parsed['statement'].get('account', ''))
-                    
-                    # Generate file based on format
-                    st.write(f"Generisem {output_format}...")
-                    if generate_excel:
-                        file_bytes = create_minimax_excel(parsed['statement'], expanded)
-                        output_name = izvod_file.name.replace('.pdf', '').replace('.PDF', '') + '_minimax.xlsx'
-                        mime_type = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-                    else:
-                        file_bytes = create_minimax_xml(parsed['statement'], expanded)
-                        output_name = izvod_file.name.replace('.pdf', '').replace('.PDF', '') + '_minimax.xml'
-                        mime_type = "application/xml"
-                    
-                    results.append({
-                        'success': True,
-                        'filename': izvod_file.name,
-                        'output_name': output_name,
-                        'file_bytes': file_bytes,
-                        'mime_type': mime_type,
-                        'format': output_format,
-                        'statement': parsed['statement'],
-                        'tx_count': len(expanded),
-                        'bex_expanded': len(expanded) > original_count,
-                        'transactions': expanded  # Keep for display
-                    })
-                    
-            except Exception as e:
-                results.append({'success': False, 'filename': izvod_file.name, 'error': str(e)})
-        
-        progress_bar.empty()
-        
-        # Display results
-        st.markdown("---")
-        st.markdown(f"## 📥 Rezultati ({output_format})")
+                job = jobs.submit(session_id, work, inputs_key=inputs_key,
+                                  output_format=st.session_state.output_format,
+                                  filenames=[name for name, _ in all_uploads])
+            except ValueError as e:
+                st.warning(str(e))
+            else:
+                pending_jobs[inputs_key] = job.id
+                # The link finds the job again after a reload
+                st.query_params['job'] = job.id
         
-        for r in results:
-            if r['success']:
-                col1, col2 = st.columns([3, 1])
-                
-                with col1:
-                    st.markdown(f"### OK {r['filename']}")
-                    formatted_account = format_account_number(r['statement']['account'])
-                    st.markdown(f"**Racun:** `{formatted_account}`")
-                    st.markdown(f"**Transakcija:** {r['tx_count']}" + 
-                              (f" BEX razbijen" if r['bex_expanded'] else ""))
-                
-                with col2:
-                    btn_label = "Preuzmi Excel" if r['format'] == "Excel" else "Preuzmi XML"
+        st.session_state.last_run = inputs_key
+    view_key = inputs_key
+
+elif st.session_state.get('reloaded_run'):
+    # Reloaded page, nothing uploaded yet: the job from the link
+    view_key = st.session_state.reloaded_run
+
+else:
+    view_key = None
+    st.info("👆 Započni upload-om PDF izvoda")
+
+# Display the last run (if it still matches the uploaded files): the job's
+# progress while it is in the works, then its results
+shown = view_key is not None and st.session_state.get('last_run') == view_key
+if shown and view_key in pending_jobs:
+    st.markdown("---")
+    show_job_progress(pending_jobs[view_key])
+
+elif shown and view_key in runs:
+    results = runs[view_key]['results']
+    run_metrics = runs[view_key]['metrics']
+    output_format = st.session_state.output_format
+    
+    # Transaction lists of all kept runs stay under the session memory
+    # cap - the oldest are moved to disk
+    store_session()
+    kept_results = [r for run in runs.values() for r in run['results']]
+    usage = store.enforce_memory_cap(kept_results)
+    
+    st.markdown("---")
+    st.markdown(f"## 📥 Rezultati ({output_format})")
+    # Notes of the run (specifications read, izvodi loaded from the ledger, BEX expanded)
+    for kind, message in runs[view_key].get('messages', []):
+        getattr(st, kind)(message)
+    
+    for index, r in enumerate(results):
+        if r['success']:
+            tx_count = len(r['transactions'])
+            col1, col2 = st.columns([3, 1])
+            
+            with col1:
+                st.markdown(f"### OK {r['filename']}")
+                formatted_account = format_account_number(r['statement']['account'])
+                st.markdown(f"**Racun:** `{formatted_account}`")
+                st.markdown(f"**Transakcija:** {tx_count}" + 
+                          (f" BEX razbijen" if r['bex_expanded'] else ""))
+                if r.get('from_ledger'):
+                    st.caption(f"📚 Iz baze - obrađen {r['from_ledger']}")
+            
+            with col2:
+                # File for the selected format is rendered on first display only,
+                # into the output store; the button reads it when clicked
+                btn_label = "Preuzmi Excel" if output_format == "Excel" else "Preuzmi XML"
+                try:
                     st.download_button(
                         btn_label,
-                        data=r['file_bytes'],
-                        file_name=r['output_name'],
-                        mime=r['mime_type'],
-                        key=f"download_{r['filename']}_{r['format']}"
+                        data=download_data(r, output_format, run_metrics),
+                        file_name=output_filename(r['filename'], output_format),
+                        mime=OUTPUT_FORMATS[output_format][1],
+                        key=f"download_{r['filename']}_{output_format}"
                     )
+                except ValueError as e:
+                    st.warning(str(e))
+            
+            # On demand only - an expander's body would run (and read spilled
+            # transactions back from disk) on every rerun
+            if st.toggle(f"📊 Pregledaj sve transakcije ({tx_count})", key=f"preview_{view_key}_{index}"):
+                st.markdown("### Lista generisanih stavki:")
                 
-                # Display transactions for verification
-                with st.expander(f"📊 Pregledaj sve transakcije ({r['tx_count']})"):
-                    st.markdown("### Lista generisanih stavki:")
-                    
-                    # Create dataframe for better display
+                # Built once and kept with the result (counted against the session
+                # memory cap). Column by column, straight from the Transaction records.
+                preview = r.get('preview')
+                if preview is None:
                     import pandas as pd
-                    tx_data = []
-                    for i, tx in enumerate(r['transactions'], 1):
-                        tx_data.append({
-                            'Br': i,
-                            'Datum': tx.get('date', ''),
-                            'Kupac': tx.get('customer_name', '')[:40],
-                            'Duguje': f"{tx.get('debit', 0):,.2f}",
-                            'Potražuje': f"{tx.get('credit', 0):,.2f}",
-                            'Opis': tx.get('description', '')[:50]
-                        })
-                    
-                    df = pd.DataFrame(tx_data)
-                    st.dataframe(df, use_container_width=True, hide_index=True)
-                    
-                    # Summary
-                    total_debit = sum(tx.get('debit', 0) for tx in r['transactions'])
-                    total_credit = sum(tx.get('credit', 0) for tx in r['transactions'])
-                    
-                    col_sum1, col_sum2, col_sum3 = st.columns(3)
-                    with col_sum1:
-                        st.metric("Ukupno Duguje", f"{total_debit:,.2f} RSD")
-                    with col_sum2:
-                        st.metric("Ukupno Potražuje", f"{total_credit:,.2f} RSD")
-                    with col_sum3:
-                        st.metric("Saldo", f"{total_credit - total_debit:,.2f} RSD")
-            else:
-                st.error(f"GRESKA {r['filename']}: {r['error']}")
+                    try:
+                        txs = list(r['transactions'])
+                    except ValueError as e:
+                        st.warning(str(e))
+                        continue
+                    preview = pd.DataFrame({
+                        'Br': range(1, len(txs) + 1),
+                        'Datum': [tx.date for tx in txs],
+                        'Kupac': [tx.customer_name[:40] for tx in txs],
+                        'Duguje': [f"{tx.debit / 100:,.2f}" for tx in txs],
+                        'Potražuje': [f"{tx.credit / 100:,.2f}" for tx in txs],
+                        'Opis': [tx.description[:50] for tx in txs],
+                    })
+                    r['total_debit'] = sum(tx.debit for tx in txs) / 100
+                    r['total_credit'] = sum(tx.credit for tx in txs) / 100
+                    del txs
+                    r['preview'] = preview
+                    r['memory_bytes'] += int(preview.memory_usage(deep=True).sum())
+                    usage = store.enforce_memory_cap(kept_results)
+                
+                st.dataframe(preview, use_container_width=True, hide_index=True)
+                
+                # Summary
+                total_debit = r['total_debit']
+                total_credit = r['total_credit']
+                
+                col_sum1, col_sum2, col_sum3 = st.columns(3)
+                with col_sum1:
+                    st.metric("Ukupno Duguje", f"{total_debit:,.2f} RSD")
+                with col_sum2:
+                    st.metric("Ukupno Potražuje", f"{total_credit:,.2f} RSD")
+                with col_sum3:
+                    st.metric("Saldo", f"{total_credit - total_debit:,.2f} RSD")
+        else:
+            st.error(f"GRESKA {r['filename']}: {r['error']}")
+    
+    show_session_memory(usage)
+    show_metrics_panel(run_metrics)
 
-else:
-    st.info("👆 Započni upload-om PDF izvoda")
+show_ledger_panel()
@@ -0,0 +1,63 @@
+"""
+Benchmark comparison
+====================
+Diffs two result files of benchmarks/run.py stage by stage and size by
+size. Exits with status 1 when any stage got slower than --threshold;
+timings under --min-seconds are too noisy to count as regressions.
+
+    python benchmarks/compare.py benchmarks/results/old.json benchmarks/results/new.json
+"""
+
+import argparse
+import json
+import sys
+
+
+def load(path):
+    with open(path, encoding='utf-8') as f:
+        report = json.load(f)
+    return report['meta'], {(r['stage'], r['rows']): r for r in report['results']}
+
+
+def format_mb(value):
+    return '-' if value is None else f"{value:.1f}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('old')
+    parser.add_argument('new')
+    parser.add_argument('--threshold', type=float, default=10.0,
+                        help='slowdown in %% reported as a regression (default: 10)')
+    parser.add_argument('--min-seconds', type=float, default=0.05,
+                        help='ignore slowdowns of stages faster than this (default: 0.05)')
+    args = parser.parse_args()
+
+    old_meta, old = load(args.old)
+    new_meta, new = load(args.new)
+    print(f"old: {old_meta.get('commit') or '?'} {old_meta.get('timestamp', '')}")
+    print(f"new: {new_meta.get('commit') or '?'} {new_meta.get('timestamp', '')}\n")
+    print(f"{'stage':>20} {'rows':>10} {'old s':>9} {'new s':>9} {'change':>8} {'old MB':>8} {'new MB':>8}")
+
+    regressions = []
+    for key in sorted(old.keys() & new.keys(), key=lambda k: (k[1], k[0])):
+        before, after = old[key], new[key]
+        change = 100 * (after['seconds'] - before['seconds']) / before['seconds'] if before['seconds'] else 0.0
+        flag = ''
+        if change > args.threshold and after['seconds'] >= args.min_seconds:
+            regressions.append(key)
+            flag = '  <-'
+        print(f"{key[0]:>20} {key[1]:>10} {before['seconds']:>9.3f} {after['seconds']:>9.3f} "
+              f"{change:>+7.1f}% {format_mb(before['peak_rss_mb']):>8} "
+              f"{format_mb(after['peak_rss_mb']):>8}{flag}")
+
+    for key in sorted(old.keys() ^ new.keys(), key=lambda k: (k[1], k[0])):
+        print(f"{key[0]:>20} {key[1]:>10}  samo u {'starom' if key in old else 'novom'} rezultatu")
+
+    if regressions:
+        print(f"\n{len(regressions)} sporijih od {args.threshold:g}%")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,162 @@
+"""
+Synthetic inputs for the benchmarks
+===================================
+XML izvodi in the Zaglavlje/Stavke schema parse_xml_izvod reads, BEX CSV
+exports with the courier's columns, plain transaction dicts and the text of
+a PDF izvod for the (stubbed) Claude path. Everything is deterministic for a
+given seed, and the large inputs are written straight to files.
+"""
+
+import random
+import sys
+from pathlib import Path
+from xml.sax.saxutils import quoteattr
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from minimax.transaction import Transaction, format_cents  # noqa: E402
+
+
+STATEMENT = {'date': '17.02.2026', 'account': '265000000012345678', 'number': '42',
+             'owner_name': 'FIRMA DOO', 'owner_address': 'BEOGRAD', 'tax_number': '4167520394'}
+
+# Every BEX_EVERY-th izvod row is a BEX payout covering one generated spec
+BEX_EVERY = 100
+BEX_CUSTOMERS_PER_PAYOUT = 10
+
+
+def make_transactions(rows, seed=1):
+    """Synthetic Transaction records - a generator, like the streaming pipeline yields."""
+    rnd = random.Random(seed)
+    for i in range(rows):
+        incoming = i % 4 != 0
+        amount = rnd.randint(500, 60000) * 100
+        yield Transaction(
+            date=f'{1 + i % 28:02d}.02.2026',
+            customer_name=f'KUPAC {i}' if i % 7 else 'RAIFFEISEN BANKA',
+            customer_address=f'MESTO {i % 500}',
+            customer_account='160000000001234567' if i % 3 else '',
+            reference=f'OT-{262000000 + i}' if i % 5 == 0 else f'97 {i}',
+            debit=0 if incoming else amount,
+            credit=amount if incoming else 0,
+            description=f'Otkup pošiljke {262000000 + i}' if i % 5 == 0 else 'Uplata po računu',
+        )
+
+
+def bex_payouts(rows, seed=2):
+    """
+    BEX payouts for an izvod of `rows` rows: list of (row index, customers),
+    each customers list a spec whose total equals that payout.
+    """
+    rnd = random.Random(seed)
+    payouts = []
+    for index in range(BEX_EVERY - 1, rows, BEX_EVERY):
+        customers = []
+        for j in range(BEX_CUSTOMERS_PER_PAYOUT):
+            posiljka = 300000000 + index * BEX_CUSTOMERS_PER_PAYOUT + j
+            customers.append({
+                'posiljka': str(posiljka),
+                'date': f'{1 + index % 28:02d}.02.2026',
+                'name': f'BEX KUPAC {posiljka}',
+                'address': f'MESTO {j}',
+                'amount': rnd.randint(500, 20000),
+            })
+        payouts.append((index, customers))
+    return payouts
+
+
+def write_xml_izvod(path, rows, seed=1):
+    """XML izvod with `rows` Stavke, including BEX payouts from bex_payouts()."""
+    payout_amounts = {index: sum(c['amount'] for c in customers)
+                      for index, customers in bex_payouts(rows)}
+
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write("<?xml version='1.0' encoding='utf-8'?>\n<TransakcioniRacunPrivredaIzvod>\n")
+        f.write(f'  <Zaglavlje BrojIzvoda="{STATEMENT["number"]}" DatumIzvoda="{STATEMENT["date"]}" '
+                f'Partija="{STATEMENT["account"]}" KomitentNaziv="{STATEMENT["owner_name"]}" '
+                f'KomitentAdresa="{STATEMENT["owner_address"]}" MaticniBroj="{STATEMENT["tax_number"]}" />\n')
+        for i, tx in enumerate(make_transactions(rows, seed)):
+            if i in payout_amounts:
+                tx.customer_name = 'BEX EXPRESS DOO'
+                tx.debit, tx.credit = 0, payout_amounts[i] * 100
+                tx.description = 'Isplata otkupnina'
+            f.write(
+                f'  <Stavke NalogKorisnik={quoteattr(tx.customer_name)} '
+                f'Mesto={quoteattr(tx.customer_address)} '
+                f'BrojRacunaPrimaocaPosiljaoca="{tx.customer_account}" '
+                f'Duguje="{format_cents(tx.debit)}" Potrazuje="{format_cents(tx.credit)}" '
+                f'PozivNaBrojKorisnika={quoteattr(tx.reference)} '
+                f'Opis={quoteattr(tx.description)} DatumValute="{tx.date}" />\n'
+            )
+        f.write("</TransakcioniRacunPrivredaIzvod>\n")
+
+
+def write_bex_csv(path, rows, seed=1):
+    """BEX CSV export with `rows` customers (IdPosiljke ... UplacenoOtkupa columns)."""
+    rnd = random.Random(seed)
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write("IdPosiljke,BrojPaketa,DatumNaplateOtkupnine,UplatilacNaziv,UplatilacMesto,UplacenoOtkupa\n")
+        for i in range(rows):
+            f.write(f'{262000000 + i},1,{rnd.randint(1, 28):02d}.02.2026 00:00:00,'
+                    f'KUPAC {i},MESTO {i % 500},"{rnd.randint(500, 60000):,}"\n')
+
+
+def bex_specifications(rows):
+    """Specs matching the BEX payouts of write_xml_izvod(path, rows), one per payout."""
+    return {
+        f'spec_{index}.csv': [
+            {**c, 'amount': float(c['amount']), 'reference': f'OT-{c["posiljka"]}'}
+            for c in customers
+        ]
+        for index, customers in bex_payouts(rows)
+    }
+
+
+def make_izvod_text(rows, pages=None, seed=1):
+    """Text of a PDF izvod (letterhead and column header on every page) for the Claude path."""
+    pages = pages or max(1, rows // 40)
+    per_page = -(-rows // pages)
+    transactions = list(make_transactions(rows, seed))
+    text = []
+    for page in range(pages):
+        text.append("RAIFFEISEN BANKA A.D. BEOGRAD\nIZVOD BROJ 42 ZA RAČUN 265-0000000012345-78\n"
+                    "Datum   Naziv   Račun   Poziv na broj   Duguje   Potražuje\n")
+        for tx in transactions[page * per_page:(page + 1) * per_page]:
+            text.append(f"{tx.date}  {tx.customer_name}  {tx.customer_account}  "
+                        f"{tx.reference}  {tx.debit / 100:,.2f}  {tx.credit / 100:,.2f}\n")
+        text.append(f"Strana {page + 1} od {pages}\n\n")
+    return "".join(text)
+
+
+def make_izvod_pdf(rows, pages=None, seed=1):
+    """
+    PDF with the text of make_izvod_text(), one PDF page per izvod page -
+    a minimal hand-written PDF (Helvetica text lines), no PDF library needed.
+    """
+    page_texts = make_izvod_text(rows, pages, seed).split("\n\n")[:-1]
+    objects = [b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    pages_ref = 2 + 2 * len(page_texts)  # object number of the page tree
+    kids = []
+    for text in page_texts:
+        lines = (line.encode('latin-1', errors='replace').replace(b"\\", b"\\\\")
+                 .replace(b"(", b"\\(").replace(b")", b"\\)") for line in text.split("\n"))
+        content = b"BT /F1 8 Tf 30 810 Td 10 TL " + b"".join(b"(" + line + b") Tj T* " for line in lines) + b"ET"
+        objects.append(b"<< /Length %d >>\nstream\n%s\nendstream" % (len(content), content))
+        objects.append(b"<< /Type /Page /Parent %d 0 R /MediaBox [0 0 595 842] "
+                       b"/Resources << /Font << /F1 1 0 R >> >> /Contents %d 0 R >>"
+                       % (pages_ref, len(objects)))
+        kids.append(len(objects))
+    objects.append(b"<< /Type /Pages /Kids [%s] /Count %d >>"
+                   % (b" ".join(b"%d 0 R" % kid for kid in kids), len(kids)))
+    objects.append(b"<< /Type /Catalog /Pages %d 0 R >>" % pages_ref)
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n%s\nendobj\n" % (number, body)
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    out += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    out += b"trailer\n<< /Size %d /Root %d 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, len(objects), xref)
+    return bytes(out)
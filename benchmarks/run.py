@@ -0,0 +1,316 @@
+"""
+Benchmark suite
+===============
+Times every local pipeline stage on synthetic inputs of growing size and
+reports throughput (rows/s) and peak RSS growth. Each (stage, size) runs in
+a fresh process, so one measurement's memory can't hide the next one's.
+Claude is replaced by an offline stub (stub_claude.py).
+
+    python benchmarks/run.py                           # all stages, 10 .. 1M rows
+    python benchmarks/run.py --sizes 1000 100000 --stages excel xml_export
+    python benchmarks/compare.py old.json new.json     # diff two runs
+
+Results are written as JSON (benchmarks/results/ by default) so runs can be
+compared over time.
+"""
+
+import argparse
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from pathlib import Path
+
+BENCH_DIR = Path(__file__).resolve().parent
+sys.path.insert(0, str(BENCH_DIR.parent))
+sys.path.insert(0, str(BENCH_DIR))
+
+import generators  # noqa: E402
+
+DEFAULT_SIZES = [10, 1_000, 10_000, 100_000, 1_000_000]
+RESULTS_DIR = BENCH_DIR / 'results'
+
+
+# ========================================================================
+# STAGES - each returns (prepare, run): prepare() builds inputs untimed,
+# run(inputs) is timed and returns the number of rows it processed. A stage
+# that leaves something running returns (prepare, run, teardown);
+# teardown() is called after the timer stops
+# ========================================================================
+
+def stage_xml_parse(files, rows):
+    from minimax.xml_izvod import stream_xml_izvod
+
+    def run(_):
+        _, transactions = stream_xml_izvod(str(files['xml']))
+        return sum(1 for _ in transactions)
+    return None, run
+
+
+def stage_bex_csv(files, rows):
+    from minimax.bex import parse_bex_specification
+
+    def prepare():
+        import pandas  # noqa: F401 - parse_bex_specification imports it lazily; keep that untimed
+        return files['csv'].read_bytes()
+
+    def run(data):
+        return len(parse_bex_specification(data, 'bench.csv'))
+    return prepare, run
+
+
+def stage_bex_expand(files, rows):
+    from minimax.bex import expand_bex_transactions
+    from minimax.xml_izvod import stream_xml_izvod
+
+    def prepare():
+        _, transactions = stream_xml_izvod(str(files['xml']))
+        return list(transactions), generators.bex_specifications(rows)
+
+    def run(inputs):
+        transactions, specifications = inputs
+        return len(expand_bex_transactions(transactions, specifications))
+    return prepare, run
+
+
+def stage_classify(files, rows):
+    from minimax.classify import fix_debit_credit_logic
+
+    def prepare():
+        return list(generators.make_transactions(rows))
+
+    def run(transactions):
+        return len(fix_debit_credit_logic(transactions, generators.STATEMENT['account']))
+    return prepare, run
+
+
+def stage_excel(files, rows):
+    from minimax.export import create_minimax_excel
+
+    def run(_):
+        create_minimax_excel(generators.STATEMENT, generators.make_transactions(rows))
+        return rows
+    return None, run
+
+
+def stage_excel_in_memory(files, rows):
+    from minimax.export import create_minimax_excel
+
+    def run(_):
+        create_minimax_excel(generators.STATEMENT, generators.make_transactions(rows), streaming=False)
+        return rows
+    return None, run
+
+
+def stage_xml_export(files, rows):
+    from minimax.export import write_minimax_xml
+
+    def run(_):
+        with open(files['out'], 'wb') as f:
+            write_minimax_xml(generators.STATEMENT, generators.make_transactions(rows), f)
+        return rows
+    return None, run
+
+
+def stage_pipeline(files, rows):
+    """XML izvod file -> parse -> BEX expansion -> debit/credit -> Excel and XML."""
+    from minimax.pipeline import convert_izvod, izvod_output, parse_izvod
+
+    def prepare():
+        return files['xml'].read_bytes(), generators.bex_specifications(rows)
+
+    def run(inputs):
+        data, specifications = inputs
+        parsed = parse_izvod(data, 'bench.xml', use_cache=False)
+        converted = convert_izvod('bench.xml', parsed, specifications)
+        izvod_output(converted, 'Excel')
+        izvod_output(converted, 'XML')
+        return len(converted['transactions'])
+    return prepare, run
+
+
+def _pdf_extract_stage(workers):
+    def stage(files, rows):
+        from minimax import config
+        from minimax.pdf import close_extract_pool, extract_pages_from_pdf
+
+        def prepare():
+            config.EXTRACT_WORKERS = workers
+            config.EXTRACT_MIN_PAGES = 2
+            data = generators.make_izvod_pdf(rows)
+            if workers:
+                extract_pages_from_pdf(generators.make_izvod_pdf(80))  # start the pool untimed
+            return data
+
+        def run(data):
+            extract_pages_from_pdf(data)
+            return rows
+
+        def teardown():
+            close_extract_pool(wait=True)  # this is a pool worker - it can't exit with the pool still up
+        return prepare, run, teardown
+    return stage
+
+
+def stage_store_spill(files, rows):
+    """Converted izvod kept in the output store, spilled to disk and read back."""
+    from minimax import config, store
+
+    def prepare():
+        config.OUTPUT_DIR = str(files['out'].parent / 'store')
+        return {'filename': 'bench.xml', 'transactions': list(generators.make_transactions(rows)),
+                'outputs': {}}
+
+    def run(converted):
+        store.keep(converted, store.new_session())
+        store.spill(converted)
+        return sum(1 for _ in converted['transactions'])
+    return prepare, run
+
+
+def _claude_stage(streamed):
+    def stage(files, rows):
+        from minimax.pipeline import parse_izvod
+        from stub_claude import install_stub
+
+        def prepare():
+            import anthropic  # noqa: F401 - keep the SDK import untimed
+            install_stub()
+            return generators.make_izvod_text(rows).encode('utf-8')
+
+        def run(data):
+            parsed = parse_izvod(data, 'bench.pdf', use_cache=False, chunked=True,
+                                 on_transaction=(lambda tx: None) if streamed else None)
+            return len(parsed['transactions'])
+        return prepare, run
+    return stage
+
+
+# Stage name -> (factory, max rows it is run for - None = any size)
+STAGES = {
+    'xml_parse': (stage_xml_parse, None),
+    'bex_csv': (stage_bex_csv, None),
+    'bex_expand': (stage_bex_expand, None),
+    'classify': (stage_classify, None),
+    'excel': (stage_excel, None),
+    'excel_in_memory': (stage_excel_in_memory, 100_000),
+    'xml_export': (stage_xml_export, None),
+    'pipeline': (stage_pipeline, None),
+    'pdf_extract': (_pdf_extract_stage(workers=0), 10_000),
+    'pdf_extract_pool': (_pdf_extract_stage(workers=os.cpu_count()), 10_000),
+    'store_spill': (stage_store_spill, None),
+    'claude_stub': (_claude_stage(streamed=False), 100_000),
+    'claude_stub_stream': (_claude_stage(streamed=True), 100_000),
+}
+
+# Stages whose work runs in other processes - this process's peak RSS says
+# nothing about them, so none is reported
+OUT_OF_PROCESS = {'pdf_extract_pool'}
+
+
+# ========================================================================
+# RUNNER
+# ========================================================================
+
+def measure(stage, files, rows):
+    """
+    Run one stage in this (fresh) process: seconds, peak RSS growth (None
+    for OUT_OF_PROCESS stages), rows processed.
+    """
+    import logging
+    logging.disable(logging.INFO)  # keep metrics log lines out of the timings
+
+    prepare, run, *teardown = STAGES[stage][0](files, rows)
+    inputs = prepare() if prepare else None
+
+    baseline = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    start = time.perf_counter()
+    processed = run(inputs)
+    elapsed = time.perf_counter() - start
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - baseline
+    for close in teardown:
+        close()
+    if stage in OUT_OF_PROCESS:
+        return elapsed, None, processed
+    return elapsed, peak * 1024, processed  # ru_maxrss is in KiB on Linux
+
+
+def measure_in_fresh_process(stage, files, rows):
+    with ProcessPoolExecutor(max_workers=1) as pool:
+        return pool.submit(measure, stage, files, rows).result()
+
+
+def make_inputs(directory, rows):
+    """Input files for one size (XML izvod, BEX CSV, export target)."""
+    files = {
+        'xml': Path(directory) / f'izvod_{rows}.xml',
+        'csv': Path(directory) / f'bex_{rows}.csv',
+        'out': Path(directory) / f'out_{rows}.xml',
+    }
+    generators.write_xml_izvod(files['xml'], rows)
+    generators.write_bex_csv(files['csv'], rows)
+    return files
+
+
+def format_mb(value):
+    return '-' if value is None else f"{value:.1f}"
+
+
+def run_metadata():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=BENCH_DIR,
+                                capture_output=True, text=True).stdout.strip()
+    except OSError:
+        commit = ''
+    return {
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'commit': commit,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES)
+    parser.add_argument('--stages', nargs='+', choices=list(STAGES), default=list(STAGES))
+    parser.add_argument('--output', type=Path, help='result JSON (default: benchmarks/results/<time>.json)')
+    args = parser.parse_args()
+
+    report = {'meta': run_metadata(), 'results': []}
+    output = args.output or RESULTS_DIR / f"bench-{datetime.now():%Y%m%d-%H%M%S}.json"
+
+    print(f"{'stage':>20} {'rows':>10} {'seconds':>9} {'rows/s':>12} {'+RSS MB':>9}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for rows in args.sizes:
+            files = make_inputs(tmp, rows)
+            for stage in args.stages:
+                max_rows = STAGES[stage][1]
+                if max_rows is not None and rows > max_rows:
+                    continue
+                elapsed, peak, processed = measure_in_fresh_process(stage, files, rows)
+                result = {
+                    'stage': stage,
+                    'rows': rows,
+                    'processed': processed,
+                    'seconds': round(elapsed, 4),
+                    'rows_per_s': round(rows / elapsed) if elapsed else None,
+                    'peak_rss_mb': round(peak / 1e6, 1) if peak is not None else None,
+                }
+                report['results'].append(result)
+                print(f"{stage:>20} {rows:>10} {elapsed:>9.3f} {result['rows_per_s'] or 0:>12,} "
+                      f"{format_mb(result['peak_rss_mb']):>9}", flush=True)
+
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, indent=2) + "\n", encoding='utf-8')
+    print(f"\nRezultati: {output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,91 @@
+"""
+Startup budget check
+====================
+Cold-start cost of the app, each measurement in a fresh interpreter:
+
+- import of the minimax package (what the CLI and every app worker pay)
+- first paint of the login screen (app.py run via Streamlit's AppTest)
+- first run after login (upload screen)
+
+Fails (exit code 1) when a measurement is over its budget or when a heavy
+library (anthropic, openpyxl, pdfplumber, pandas) gets imported before it is
+needed - none of them belongs on the login or upload screen.
+
+    python benchmarks/startup.py
+    python benchmarks/startup.py --import-budget 0.2 --paint-budget 1.5
+"""
+
+import argparse
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# Imported only by the stages that need them
+HEAVY_MODULES = ['anthropic', 'openpyxl', 'pdfplumber', 'pandas']
+
+IMPORT_SCRIPT = """
+import json, sys, time
+start = time.perf_counter()
+import minimax
+seconds = time.perf_counter() - start
+print(json.dumps({'seconds': seconds, 'loaded': sorted(m for m in HEAVY if m in sys.modules)}))
+"""
+
+# Streamlit itself is imported before the clock starts - it is the
+# platform's cost, not ours
+APP_SCRIPT = """
+import json, sys, time
+from streamlit.testing.v1 import AppTest
+app = AppTest.from_file('app.py', default_timeout=60)
+app.session_state['authenticated'] = AUTHENTICATED
+start = time.perf_counter()
+app.run()
+seconds = time.perf_counter() - start
+print(json.dumps({'seconds': seconds, 'loaded': sorted(m for m in HEAVY if m in sys.modules),
+                  'error': [str(e.value) for e in app.exception]}))
+"""
+
+
+def run_fresh(script, **names):
+    """Run a measurement script in a new interpreter, return its JSON result."""
+    prelude = f"HEAVY = {HEAVY_MODULES!r}\n" + "".join(f"{k} = {v!r}\n" for k, v in names.items())
+    result = subprocess.run([sys.executable, '-c', prelude + script], cwd=ROOT,
+                            capture_output=True, text=True)
+    if result.returncode != 0:
+        raise SystemExit(f"Merenje nije uspelo:\n{result.stderr}")
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--import-budget', type=float, default=0.3, help='seconds for import minimax')
+    parser.add_argument('--paint-budget', type=float, default=2.0, help='seconds for the login screen')
+    parser.add_argument('--app-budget', type=float, default=3.0, help='seconds for the first run after login')
+    args = parser.parse_args()
+
+    checks = [
+        ('import minimax', args.import_budget, run_fresh(IMPORT_SCRIPT)),
+        ('login screen', args.paint_budget, run_fresh(APP_SCRIPT, AUTHENTICATED=False)),
+        ('after login', args.app_budget, run_fresh(APP_SCRIPT, AUTHENTICATED=True)),
+    ]
+
+    failed = False
+    for name, budget, result in checks:
+        problems = []
+        if result['seconds'] > budget:
+            problems.append(f"preko budžeta {budget:.2f}s")
+        if result['loaded']:
+            problems.append("učitano: " + ", ".join(result['loaded']))
+        if result.get('error'):
+            problems.append("greška: " + "; ".join(result['error']))
+        failed = failed or bool(problems)
+        print(f"{name:>15} {result['seconds']:>7.3f}s  {'FAIL ' + ', '.join(problems) if problems else 'OK'}")
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
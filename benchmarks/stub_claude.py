@@ -0,0 +1,85 @@
+"""
+Stubbed Claude client
+=====================
+Stands in for anthropic.Anthropic in benchmarks: answers izvod prompts with
+one JSON transaction per statement line found in the prompt text, instantly
+and offline, so the Claude path (normalization, chunking, JSON parsing,
+streaming) can be timed without the network.
+
+    from stub_claude import install_stub
+    install_stub()   # minimax.client.get_client() now returns the stub
+"""
+
+import json
+import re
+from types import SimpleNamespace
+
+
+# A statement row: date, then the counterparty's first two words
+LINE_RE = re.compile(r'^(\d{2}\.\d{2}\.\d{4})\s+(\S+(?: \S+)?)', re.MULTILINE)
+STREAM_CHUNK_CHARS = 40
+
+
+def answer(prompt):
+    """JSON answer for an izvod prompt - one transaction per dated line."""
+    transactions = [
+        {'date': date, 'customer_name': name, 'customer_address': '', 'customer_account': '',
+         'customer_tax_number': '', 'reference': '', 'currency': 'RSD',
+         'debit': 0.0, 'credit': 1000.0, 'description': 'Uplata'}
+        for date, name in LINE_RE.findall(prompt)
+    ]
+    return json.dumps({
+        'statement': {'date': '17.02.2026', 'account': '265000000012345678', 'number': '42',
+                      'owner_name': 'FIRMA DOO', 'owner_address': '', 'tax_number': ''},
+        'transactions': transactions,
+    }, ensure_ascii=False, indent=2)
+
+
+class _Stream:
+    """Iterable of Messages streaming events, usable as a context manager."""
+
+    def __init__(self, text):
+        self.text = text
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def __iter__(self):
+        usage = SimpleNamespace(input_tokens=0, output_tokens=0)
+        yield SimpleNamespace(type='message_start', message=SimpleNamespace(usage=usage))
+        for i in range(0, len(self.text), STREAM_CHUNK_CHARS):
+            yield SimpleNamespace(type='content_block_delta',
+                                  delta=SimpleNamespace(type='text_delta',
+                                                        text=self.text[i:i + STREAM_CHUNK_CHARS]))
+        yield SimpleNamespace(type='message_delta', delta=SimpleNamespace(stop_reason='end_turn'),
+                              usage=SimpleNamespace(output_tokens=len(self.text) // 4))
+
+
+class _Messages:
+    def create(self, messages, stream=False, **params):
+        prompt = messages[0]['content']
+        text = answer(prompt)
+        if stream:
+            return _Stream(text)
+        return SimpleNamespace(
+            content=[SimpleNamespace(text=text)],
+            stop_reason='end_turn',
+            usage=SimpleNamespace(input_tokens=len(prompt) // 4, output_tokens=len(text) // 4),
+        )
+
+
+class StubClient:
+    messages = _Messages()
+
+
+def install_stub():
+    """Make the shared client (minimax.client.get_client) the stub; no rate limit."""
+    from minimax import client, config
+
+    config.ANTHROPIC_API_KEY = config.ANTHROPIC_API_KEY or 'stub'
+    config.CLAUDE_RPM = 0
+    client._client = StubClient()
+    client._client_key = (config.ANTHROPIC_API_KEY, config.ANTHROPIC_BASE_URL)
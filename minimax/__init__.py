@@ -0,0 +1,33 @@
+"""
+Minimax Izvod core
+==================
+UI-free parsing, BEX expansion, debit/credit fixing and Minimax export,
+shared by the Streamlit app (app.py) and the batch CLI (python -m minimax).
+"""
+
+from .batch import run_message_batch
+from .bex import (
+    build_spec_index,
+    expand_bex_transactions,
+    iter_expand_bex_transactions,
+    parse_bex_specification,
+    read_bex_csv,
+)
+from .classify import fix_debit_credit_logic, iter_fix_debit_credit_logic
+from .export import create_minimax_excel, create_minimax_xml, format_account_number, write_minimax_xml
+from .pdf import extract_pages_from_pdf, extract_text_from_pdf, iter_pages_from_pdf, parse_pdf_tables
+from .pipeline import (
+    OUTPUT_FORMATS,
+    convert_izvod,
+    convert_uploads,
+    find_processed,
+    izvod_output,
+    output_filename,
+    parse_izvod,
+    parse_izvodi_parallel,
+    parse_uploads_batched,
+    process_izvod,
+    render_output,
+)
+from .transaction import Transaction
+from .xml_izvod import parse_xml_izvod, stream_xml_izvod
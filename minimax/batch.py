@@ -0,0 +1,89 @@
+"""
+Message Batches
+===============
+Submits many Claude prompts as one Message Batch instead of one synchronous
+call each - half the price and no per-request rate limiting, at the cost of
+latency (minutes, up to 24h). Meant for converting a month of izvodi at once.
+
+The client is the shared one from minimax.client (ANTHROPIC_BASE_URL can
+point it at a local fake batch server), or any object with the same
+messages.batches interface passed in explicitly.
+"""
+
+import logging
+import time
+
+from . import config, metrics
+from .client import call_api, get_client
+
+logger = logging.getLogger(__name__)
+
+def run_message_batch(requests, client=None, on_progress=None):
+    """
+    Run prompts as one Message Batch and wait for it to finish.
+    
+    requests: dict custom_id -> Messages API params (model, max_tokens, messages).
+              custom_id: 1-64 chars of [a-zA-Z0-9_-].
+    on_progress: optional callback(done, total) after every status poll
+    
+    Returns dict custom_id -> (message, error); error is a ValueError for
+    requests that errored, expired or were canceled.
+    """
+    if not requests:
+        return {}
+    
+    with metrics.stage('claude_batch', requests=len(requests)) as m:
+        results = _run_message_batch(requests, client or get_client(), on_progress)
+        for msg, _ in results.values():
+            if msg is not None:
+                metrics.record_usage(m, msg.usage)
+        m['failed'] = sum(1 for _, error in results.values() if error is not None)
+    return results
+
+def _run_message_batch(requests, client, on_progress):
+    """Submit, poll until ended, collect results (run_message_batch without metrics)."""
+    batch = call_api(
+        client.messages.batches.create,
+        requests=[{'custom_id': custom_id, 'params': params}
+                  for custom_id, params in requests.items()]
+    )
+    logger.info("Batch %s: %d requests submitted", batch.id, len(requests))
+    
+    deadline = time.monotonic() + config.BATCH_TIMEOUT_SECONDS
+    while batch.processing_status != 'ended':
+        if on_progress:
+            on_progress(_finished_count(batch), len(requests))
+        if time.monotonic() > deadline:
+            call_api(client.messages.batches.cancel, batch.id)
+            raise ValueError(f"Batch {batch.id} nije završen na vreme - otkazan")
+        time.sleep(config.BATCH_POLL_SECONDS)
+        batch = call_api(client.messages.batches.retrieve, batch.id)
+    
+    if on_progress:
+        on_progress(len(requests), len(requests))
+    
+    results = {}
+    for entry in call_api(client.messages.batches.results, batch.id):
+        result = entry.result
+        if result.type == 'succeeded':
+            results[entry.custom_id] = (result.message, None)
+        elif result.type == 'errored':
+            results[entry.custom_id] = (None, ValueError(f"AI greška: {_error_message(result)}"))
+        else:
+            results[entry.custom_id] = (None, ValueError(f"AI zahtev nije obrađen ({result.type})"))
+    
+    # Requests missing from the results file are failures too
+    for custom_id in requests:
+        results.setdefault(custom_id, (None, ValueError("AI zahtev nema rezultat")))
+    return results
+
+def _finished_count(batch):
+    """Requests of the batch that are done, whatever their outcome."""
+    counts = batch.request_counts
+    return counts.succeeded + counts.errored + counts.canceled + counts.expired
+
+def _error_message(result):
+    """Message of an 'errored' batch result (error response -> error -> message)."""
+    error = getattr(result, 'error', None)
+    inner = getattr(error, 'error', error)
+    return getattr(inner, 'message', None) or str(inner)
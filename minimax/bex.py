@@ -0,0 +1,358 @@
+"""
+BEX specifications
+==================
+Parsing BEX Express specifications (CSV exports or PDF via Claude) and
+expanding BEX payouts on an izvod into the individual customers they cover.
+"""
+
+import io
+import logging
+from datetime import datetime
+
+from . import metrics
+from .cache import cache_key, cache_get, cache_put
+from .claude import BEX_PROMPT_VERSION, parse_bex_with_claude
+from .normalize import normalize_for_prompt
+from .pdf import extract_pages_from_pdf
+from .transaction import Transaction, to_cents
+
+logger = logging.getLogger(__name__)
+
+# BEX CSV export: field -> (column name, positional fallback)
+BEX_CSV_COLUMNS = {
+    'posiljka': ('IdPosiljke', 0),
+    'date': ('DatumNaplateOtkupnine', 2),
+    'name': ('UplatilacNaziv', 3),
+    'address': ('UplatilacMesto', 4),
+    'amount': ('UplacenoOtkupa', 5),
+}
+CSV_CHUNK_ROWS = 50_000
+
+# One BEX payout can cover up to this many specifications (subset-sum search),
+# collected at most BEX_PAYOUT_WINDOW_DAYS days before the payout
+BEX_MAX_SPECS_PER_PAYOUT = 3
+BEX_PAYOUT_WINDOW_DAYS = 7
+BEX_SUBSET_BUDGET = 50_000
+
+def read_bex_csv(source, chunksize=None):
+    """
+    Read a BEX CSV export column-wise, yielding lists of customer dicts per chunk.
+    
+    source: path or binary file object. Columns are mapped once from the header
+    (by name, positional fallback), amounts and dates are converted with
+    vectorized string ops and invalid rows are dropped in bulk. Large files are
+    streamed in chunks of `chunksize` rows (default CSV_CHUNK_ROWS).
+    """
+    import pandas as pd
+    
+    if hasattr(source, 'seek'):
+        start = source.tell()
+        header = pd.read_csv(source, nrows=0).columns
+        source.seek(start)
+    else:
+        header = pd.read_csv(source, nrows=0).columns
+    
+    # Resolve field -> column once for the whole file
+    columns = {}
+    for field, (name, position) in BEX_CSV_COLUMNS.items():
+        if name in header:
+            columns[field] = name
+        elif position < len(header):
+            columns[field] = header[position]
+    
+    reader = pd.read_csv(
+        source,
+        usecols=sorted(set(columns.values()), key=list(header).index),
+        dtype=str,
+        keep_default_na=False,
+        chunksize=chunksize or CSV_CHUNK_ROWS
+    )
+    
+    for df in reader:
+        yield _bex_csv_frame_to_customers(df, columns)
+
+def _bex_csv_frame_to_customers(df, columns):
+    """Vectorized conversion of one BEX CSV chunk to customer dicts."""
+    import pandas as pd
+    
+    def column(field):
+        if field in columns:
+            return df[columns[field]].str.strip()
+        return pd.Series('', index=df.index)
+    
+    posiljka = column('posiljka')
+    name = column('name')
+    address = column('address')
+    
+    # Amounts: drop thousands separators ("11,400" / "11.400" -> 11400)
+    amount = pd.to_numeric(
+        column('amount').str.replace(r'[,.]', '', regex=True),
+        errors='coerce'
+    )
+    
+    # Convert from "17.02.2026 00:00:00" to "17.02.2026"
+    date = column('date').str.split(n=1).str[0].fillna('')
+    
+    valid = (posiljka != '') & (name != '') & (amount > 0)
+    
+    # Materialize each column once - iterating Series element-wise is slow
+    return [
+        {
+            'name': n,
+            'address': a,
+            'amount': amt,
+            'posiljka': p,
+            'reference': f'OT-{p}',
+            'date': d
+        }
+        for p, n, a, amt, d in zip(posiljka[valid].tolist(), name[valid].tolist(),
+                                   address[valid].tolist(), amount[valid].astype(float).tolist(),
+                                   date[valid].tolist())
+    ]
+
+def parse_bex_specification(file_bytes, filename, use_cache=True):
+    """
+    Parse BEX specification - supports both CSV and PDF formats.
+    
+    CSV: Direct parsing (instant, 100% accuracy)
+    PDF: Claude AI parsing (like izvod parsing, ~95-98% accuracy), cached on disk
+    
+    Raises ValueError when the file can't be parsed.
+    """
+    with metrics.labels(file=filename), metrics.stage('bex_spec', bytes=len(file_bytes)) as m:
+        customers = _parse_bex_specification(file_bytes, filename, use_cache)
+        m['rows'] = len(customers)
+    return customers
+
+def _parse_bex_specification(file_bytes, filename, use_cache):
+    # ========================================================================
+    # CSV FORMAT (Instant parsing)
+    # ========================================================================
+    if filename.lower().endswith('.csv'):
+        try:
+            customers = []
+            for chunk in read_bex_csv(io.BytesIO(file_bytes)):
+                customers.extend(chunk)
+            return customers
+        
+        except Exception as e:
+            raise ValueError(f"CSV parsing greška: {str(e)}")
+    
+    # ========================================================================
+    # PDF FORMAT (AI parsing with Claude)
+    # ========================================================================
+    else:
+        try:
+            key = cache_key(file_bytes, BEX_PROMPT_VERSION)
+            data = cache_get(key) if use_cache else None
+            if data is None:
+                pages = normalize_for_prompt(extract_pages_from_pdf(file_bytes), filename)
+                data = parse_bex_with_claude("".join(pages))
+                cache_put(key, data)
+            
+            return bex_customers_from_json(data)
+        
+        except Exception as e:
+            raise ValueError(f"PDF parsing greška: {str(e)}")
+
+def bex_customers_from_json(data):
+    """Claude's BEX JSON ({'customers': [...]}) -> customer dicts."""
+    customers = []
+    for c in data.get('customers', []):
+        customers.append({
+            'name': c.get('name', ''),
+            'address': c.get('address', ''),
+            'amount': float(c.get('amount', 0)),
+            'posiljka': str(c.get('posiljka', '')),
+            'reference': f"OT-{c.get('posiljka', '')}",
+            'date': c.get('date', '')
+        })
+    return customers
+
+def parse_date(date_str):
+    """Parse 'DD.MM.YYYY' (time part ignored) -> date, or None."""
+    try:
+        return datetime.strptime(str(date_str).split()[0], '%d.%m.%Y').date()
+    except (ValueError, IndexError):
+        return None
+
+def build_spec_index(specifications):
+    """
+    Precompute BEX spec totals (in cents) and an amount -> spec names index.
+    
+    The index also records which specs were already matched, so build it once
+    per batch and pass it to every expand_bex_transactions call - that way one
+    spec is never used for two payouts.
+    """
+    totals = {}
+    by_total = {}
+    dates = {}
+    for spec_name, customers in specifications.items():
+        total = sum(to_cents(c['amount']) for c in customers)
+        totals[spec_name] = total
+        by_total.setdefault(total, []).append(spec_name)
+        
+        # Last collection date - the payout can't come before it
+        spec_dates = [d for d in (parse_date(c.get('date', '')) for c in customers) if d]
+        dates[spec_name] = max(spec_dates) if spec_dates else None
+    
+    return {
+        'totals': totals,
+        'by_total': by_total,
+        'dates': dates,
+        'used': set()
+    }
+
+def match_specs(spec_index, amount_cents, payout_date=None, max_specs=None):
+    """
+    Find unused spec(s) paid by one BEX transfer of amount_cents.
+    
+    An exact single-spec match is tried first (dict lookup), then a bounded
+    subset-sum search, smallest combinations first, over specs collected in
+    the BEX_PAYOUT_WINDOW_DAYS before payout_date. Matched specs are marked
+    as used. Returns the list of spec names (empty if nothing matches).
+    """
+    if amount_cents <= 0:
+        return []
+    
+    used = spec_index['used']
+    for spec_name in spec_index['by_total'].get(amount_cents, []):
+        if spec_name not in used:
+            used.add(spec_name)
+            return [spec_name]
+    
+    # Many specs add up to almost any amount, so only combine specs that
+    # could have been paid by this transfer
+    def in_window(spec_name):
+        spec_date = spec_index['dates'].get(spec_name)
+        if payout_date is None or spec_date is None:
+            return True
+        return 0 <= (payout_date - spec_date).days <= BEX_PAYOUT_WINDOW_DAYS
+    
+    candidates = sorted(
+        ((total, spec_name) for spec_name, total in spec_index['totals'].items()
+         if spec_name not in used and 0 < total < amount_cents and in_window(spec_name)),
+        key=lambda item: -item[0]
+    )
+    subset = _find_spec_subset(candidates, amount_cents,
+                               max_specs or BEX_MAX_SPECS_PER_PAYOUT, BEX_SUBSET_BUDGET)
+    if subset:
+        used.update(subset)
+    return subset or []
+
+def matches_unused_spec(transactions, spec_index):
+    """
+    True when a BEX payout among transactions (left unexpanded) would match
+    an unused spec of spec_index - e.g. an izvod converted before its spec
+    was uploaded. spec_index is not changed.
+    """
+    trial = {**spec_index, 'used': set(spec_index['used'])}
+    for tx in transactions:
+        if 'BEX' in tx.customer_name.upper() and match_specs(trial, tx.credit or tx.debit, parse_date(tx.date)):
+            return True
+    return False
+
+def _find_spec_subset(candidates, target, max_specs, budget):
+    """
+    Depth-limited subset-sum over candidates sorted by total, largest first.
+    
+    The last spec of every combination is found with a dict lookup and
+    branches that can't reach the target are pruned with prefix sums;
+    `budget` caps the number of visited nodes so a huge month stays fast.
+    Combination sizes are tried in increasing order (2, 3, ... max_specs).
+    """
+    prefix = [0]
+    positions = {}
+    for i, (total, _) in enumerate(candidates):
+        prefix.append(prefix[-1] + total)
+        positions.setdefault(total, []).append(i)
+    
+    steps = 0
+    
+    def search(start, remaining, depth_left):
+        nonlocal steps
+        for i in positions.get(remaining, []):
+            if i >= start:
+                return [i]
+        if depth_left <= 1:
+            return None
+        
+        for i in range(start, len(candidates)):
+            steps += 1
+            if steps > budget:
+                return None
+            
+            total = candidates[i][0]
+            if total >= remaining:
+                continue
+            # Same total as the previous sibling gives the same sub-search
+            if i > start and total == candidates[i - 1][0]:
+                continue
+            # Even the largest remaining specs can't add up - later ones are smaller
+            if prefix[min(i + depth_left, len(candidates))] - prefix[i] < remaining:
+                break
+            
+            found = search(i + 1, remaining - total, depth_left - 1)
+            if found:
+                return [i] + found
+        return None
+    
+    for depth in range(2, max_specs + 1):
+        found = search(0, target, depth)
+        if found:
+            return [candidates[i][1] for i in found]
+        if steps > budget:
+            break
+    return None
+
+def expand_bex_transactions(transactions, specifications, spec_index=None, on_match=None):
+    """
+    Expand BEX transactions using specifications.
+    
+    spec_index: shared build_spec_index() result for the whole batch; a spec
+    matched here is not matched again for another payout.
+    on_match: optional callback(spec_names, customer_count) per expanded payout
+    """
+    with metrics.stage('bex_expand') as m:
+        expanded = list(iter_expand_bex_transactions(
+            metrics.counted(transactions, m, 'rows_in'), specifications, spec_index, on_match
+        ))
+        m['rows'] = len(expanded)
+    return expanded
+
+def iter_expand_bex_transactions(transactions, specifications, spec_index=None, on_match=None):
+    """Generator version of expand_bex_transactions - consumes any iterable lazily."""
+    if spec_index is None:
+        spec_index = build_spec_index(specifications)
+    
+    # Only the customer rows are new records - every other transaction is
+    # passed through as the same object
+    for tx in transactions:
+        is_bex = 'BEX' in tx.customer_name.upper()
+        
+        if is_bex:
+            tx_amount = tx.credit or tx.debit
+            
+            # Find matching spec(s) - one payout can cover several specs
+            matched = match_specs(spec_index, tx_amount, parse_date(tx.date))
+            
+            if matched:
+                customers = [c for spec_name in matched for c in specifications[spec_name]]
+                logger.info("Expanding BEX payout into %d customers from %s", len(customers), matched)
+                if on_match:
+                    on_match(matched, len(customers))
+                
+                for c in customers:
+                    yield Transaction(
+                        date=c['date'],
+                        customer_name=c['name'],
+                        customer_address=c['address'],
+                        reference=c['reference'],
+                        debit=0,  # BEX customers are always CREDIT (income)
+                        credit=to_cents(c['amount']),
+                        description=f"Otkup pošiljke {c['posiljka']}"
+                    )
+            else:
+                yield tx
+        else:
+            yield tx
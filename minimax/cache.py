@@ -0,0 +1,92 @@
+"""
+Parse cache
+===========
+Content-addressed on-disk cache of Claude parse results: key is a hash of
+model + prompt version + file bytes, value the parsed JSON. Entries are
+written atomically, a hit refreshes the file mtime, and the directory is
+trimmed least-recently-used first to CACHE_MAX_MB.
+"""
+
+import os
+import json
+import hashlib
+import tempfile
+import threading
+from pathlib import Path
+
+from . import config
+
+_cache_lock = threading.Lock()
+
+def cache_key(file_bytes, prompt_version):
+    """Content-addressed key: hash of model + prompt version + file bytes."""
+    h = hashlib.sha256()
+    h.update(f"{config.CLAUDE_MODEL}|{prompt_version}|".encode('utf-8'))
+    h.update(file_bytes)
+    return h.hexdigest()
+
+def _cache_dir():
+    return Path(config.CACHE_DIR)
+
+def cache_get(key):
+    """Return cached parse result for key, or None on miss."""
+    path = _cache_dir() / f"{key}.json"
+    try:
+        data = json.loads(path.read_text(encoding='utf-8'))
+    except (OSError, ValueError):
+        return None
+    
+    # Touch on hit - mtime is the LRU clock
+    try:
+        os.utime(path)
+    except OSError:
+        pass
+    return data
+
+def cache_put(key, data):
+    """Store parse result atomically and evict least recently used entries."""
+    cache_dir = _cache_dir()
+    try:
+        cache_dir.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=cache_dir, suffix='.tmp')
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp_path, cache_dir / f"{key}.json")
+    except OSError:
+        return  # Cache is best-effort, never fail the parse because of it
+    
+    _evict_cache()
+
+def _evict_cache():
+    """Delete oldest cache entries until total size fits CACHE_MAX_MB."""
+    max_bytes = config.CACHE_MAX_MB * 1024 * 1024
+    with _cache_lock:
+        entries = []
+        for path in _cache_dir().glob('*.json'):
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= max_bytes:
+                break
+            try:
+                path.unlink()
+                total -= size
+            except OSError:
+                pass
+
+def cache_clear():
+    """Invalidate the whole parse cache. Returns number of removed entries."""
+    removed = 0
+    with _cache_lock:
+        for path in _cache_dir().glob('*.json'):
+            try:
+                path.unlink()
+                removed += 1
+            except OSError:
+                pass
+    return removed
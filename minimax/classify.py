@@ -0,0 +1,188 @@
+"""
+Debit/credit classification
+===========================
+Decides per transaction whether money came in (credit) or went out (debit).
+
+The rules are data, not code: a JSON table (classify_rules.json next to
+this module, or the file named by the CLASSIFY_RULES setting) checked in
+order, the first matching rule deciding:
+
+    {"name": "Banke", "field": "customer_name", "contains": ["RAIFFEISEN", "NLB"], "direction": "debit"}
+    {"name": "Sopstveni račun", "when": "owner_account", "direction": "credit"}
+
+"contains" matches a substring of the field (upper-cased, except for
+reference); "when" is owner_account (counterparty account = owner's) or
+both_amounts (debit and credit both set); "direction" is credit, debit or
+keep (leave the amounts alone). Transactions no rule matches get "default".
+
+Each rule's names are compiled into a single trie regex, so a rule costs
+one scan per transaction however many counterparties it lists. The table
+is reloaded when its file changes - no restart needed.
+"""
+
+import hashlib
+import json
+import re
+import threading
+from pathlib import Path
+
+from . import config, metrics
+
+DEFAULT_RULES_FILE = Path(__file__).with_name('classify_rules.json')
+
+DIRECTIONS = ('credit', 'debit', 'keep')
+CONDITIONS = ('owner_account', 'both_amounts')
+
+# Fields matched exactly as written; all others are compared upper-cased
+CASE_SENSITIVE_FIELDS = {'reference'}
+
+_compiled = {}  # rules file -> (mtime, compiled rules)
+_compiled_lock = threading.Lock()
+
+def fix_debit_credit_logic(transactions, owner_account, rules=None):
+    """
+    Fix debit/credit of every transaction by the rules table:
+    - BEX customers (income from courier) → CREDIT (money IN)
+    - Payments to suppliers/banks → DEBIT (money OUT)
+    - Transfers from own account → CREDIT (money IN)
+    """
+    with metrics.stage('classify') as m:
+        fixed = list(iter_fix_debit_credit_logic(transactions, owner_account, rules))
+        m['rows'] = len(fixed)
+    return fixed
+
+def iter_fix_debit_credit_logic(transactions, owner_account, rules=None):
+    """
+    Generator version of fix_debit_credit_logic - consumes any iterable lazily.
+    rules: compiled table from compile_rules() (default: load_rules())
+    """
+    rules = rules or load_rules()
+    owner_account_clean = normalize_account(owner_account)
+    
+    for tx in transactions:
+        direction = classify_transaction(tx, owner_account_clean, rules)
+        if direction == 'keep':
+            yield tx
+            continue
+        
+        amount = tx.credit or tx.debit
+        if direction == 'credit':
+            tx.debit = 0
+            tx.credit = amount
+        else:
+            tx.debit = amount
+            tx.credit = 0
+        
+        yield tx
+
+def classify_transaction(tx, owner_account_clean, rules):
+    """Direction ('credit', 'debit' or 'keep') of the first rule matching a Transaction."""
+    texts = {}  # field -> text as matched, prepared once per transaction
+    
+    for when, field, regex, direction in rules['checks']:
+        if regex is not None:
+            text = texts.get(field)
+            if text is None:
+                text = tx.get(field) or ''
+                if field not in CASE_SENSITIVE_FIELDS:
+                    text = text.upper()
+                texts[field] = text
+            if regex.search(text):
+                return direction
+        
+        elif when == 'owner_account':
+            cust_account = normalize_account(tx.customer_account)
+            if cust_account and cust_account == owner_account_clean:
+                return direction
+        
+        elif tx.debit > 0 and tx.credit > 0:  # both_amounts
+            return direction
+    
+    return rules['default']
+
+def normalize_account(account):
+    """Account number with separators removed, for comparing."""
+    return (account or '').replace('-', '').replace(' ', '')
+
+# ========================================================================
+# RULES TABLE
+# ========================================================================
+
+def load_rules(path=None):
+    """Compiled rules from path (default: CLASSIFY_RULES or the bundled table), recompiled on change."""
+    path = Path(path or config.CLASSIFY_RULES or DEFAULT_RULES_FILE)
+    mtime = path.stat().st_mtime_ns
+    
+    with _compiled_lock:
+        cached = _compiled.get(path)
+    if cached and cached[0] == mtime:
+        return cached[1]
+    
+    text = path.read_text(encoding='utf-8')
+    try:
+        table = json.loads(text)
+    except ValueError as e:
+        raise ValueError(f"Pravila klasifikacije ({path.name}) nisu ispravan JSON: {e}")
+    rules = compile_rules(table, path.name)
+    # Identity of the table, stored with results built from it (see minimax.ledger)
+    rules['version'] = hashlib.sha256(text.encode('utf-8')).hexdigest()[:16]
+    
+    with _compiled_lock:
+        _compiled[path] = (mtime, rules)
+    return rules
+
+def compile_rules(table, source='pravila'):
+    """
+    Compile a rules table ({'default': ..., 'rules': [...]}) for
+    classify_transaction(): a list of checks in precedence order, each name
+    list compiled into one trie regex.
+    """
+    default = table.get('default', 'debit')
+    if default not in ('credit', 'debit'):
+        raise ValueError(f"{source}: nepoznat default smer '{default}'")
+    
+    checks = []
+    for index, rule in enumerate(table.get('rules', [])):
+        label = rule.get('name') or f"pravilo {index + 1}"
+        direction = rule.get('direction')
+        if direction not in DIRECTIONS:
+            raise ValueError(f"{source}: {label} - nepoznat smer '{direction}'")
+        
+        if 'when' in rule:
+            if rule['when'] not in CONDITIONS:
+                raise ValueError(f"{source}: {label} - nepoznat uslov '{rule['when']}'")
+            checks.append((rule['when'], None, None, direction))
+            continue
+        
+        field = rule.get('field')
+        contains = rule.get('contains')
+        if not field or not isinstance(contains, list) or not all(isinstance(n, str) for n in contains):
+            raise ValueError(f"{source}: {label} - potrebni su 'field' i lista 'contains' (ili 'when')")
+        if field not in CASE_SENSITIVE_FIELDS:
+            contains = [name.upper() for name in contains]
+        names = [name for name in contains if name]
+        if names:
+            checks.append((None, field, re.compile(_trie_pattern(names)), direction))
+    
+    return {'default': default, 'checks': checks}
+
+def _trie_pattern(names):
+    """
+    Regex matching any of names, built as a trie: at each position the regex
+    engine follows one branch per character instead of trying every name, so
+    a rule with thousands of counterparties costs about the same as one with ten.
+    """
+    trie = {}
+    for name in names:
+        node = trie
+        for ch in name:
+            node = node.setdefault(ch, {})
+        node[''] = {}  # end of a name
+    return _node_pattern(trie)
+
+def _node_pattern(node):
+    """Pattern of one trie node; a node ending a name needs nothing more to match."""
+    if '' in node:
+        return ''
+    branches = [re.escape(ch) + _node_pattern(child) for ch, child in node.items()]
+    return branches[0] if len(branches) == 1 else '(?:' + '|'.join(branches) + ')'
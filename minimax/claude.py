@@ -0,0 +1,378 @@
+"""
+Claude parsing
+==============
+Prompts and calls for turning izvod / BEX specification text into JSON.
+"""
+
+import json
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from . import config, metrics
+from .client import create_message
+
+# Prompt versions - bump one when its prompt (or the text normalization in
+# front of it) changes, so cached parse results from the old one are not reused
+IZVOD_PROMPT_VERSION = "izvod-v2"
+BEX_PROMPT_VERSION = "bex-v2"
+
+# Output budget of one izvod call: ~150 transactions (~105 tokens each).
+# Kept under the SDK's limit for non-streamed requests.
+IZVOD_MAX_TOKENS = 16000
+
+# A response cut off at max_tokens is parsed again as two halves of its
+# text, at most this many times over (up to 8 pieces)
+MAX_SPLIT_DEPTH = 3
+
+class TruncatedResponse(ValueError):
+    """Claude's response hit max_tokens - transactions are missing from it."""
+
+def parse_bex_with_claude(text):
+    """Parse BEX specification text with Claude. Returns the raw parsed JSON."""
+    if not config.ANTHROPIC_API_KEY:
+        raise ValueError("API key nije konfigurisan za PDF parsiranje!")
+    
+    with metrics.stage('claude_bex', chars=len(text)) as m:
+        msg = create_message(**bex_request(text))
+        metrics.record_usage(m, msg.usage)
+    return parse_bex_message(msg)
+
+def bex_request(text):
+    """Messages API parameters for parsing one BEX specification."""
+    prompt = f"""Analiziraj BEX Express specifikaciju i izvuci podatke o kupcima.
+
+TEKST SPECIFIKACIJE:
+{text}
+
+Vrati SAMO JSON (bez markdown):
+
+{{
+  "customers": [
+    {{
+      "posiljka": "262598547",
+      "name": "MILEV JOVAN",
+      "address": "PIROT, OBILIĆEVA 3",
+      "amount": 11400,
+      "date": "18.02.2026"
+    }},
+    ...
+  ]
+}}
+
+KRITIČNO VAŽNA PRAVILA ZA IZNOSE:
+1. Iznos je u koloni "Iznos" u PDF-u
+2. Format iznosa u PDF-u: 11,400 ili 2,050 ili 23,093
+3. UKLONI SVE ZAREZE iz iznosa: 11,400 → 11400
+4. NIKAD ne dodavaj nule: ako piše 11,400 to je 11400 dinara, NE 114000!
+5. Ako iznos ima 2 decimale (11,40), zadrži ih: 11,40 → 1140
+6. Proveri: suma svih iznosa mora biti realna (ispod 1,000,000 RSD po specifikaciji)
+
+OSTALA PRAVILA:
+- posiljka = 9-cifreni broj pošiljke (Br.pošiljke kolona)
+- name = Ime i prezime uplatilca TAČNO kao što piše (VELIKA SLOVA)
+- address = Adresa TAČNO kao što piše
+- date = Datum naplate (D.naplate kolona) u formatu DD.MM.YYYY
+- NIKAD ne izmišljaj podatke
+- Izvuci SVE redove iz tabele"""
+    
+    return {
+        'model': config.CLAUDE_MODEL,
+        'max_tokens': 4096,
+        'messages': [{"role": "user", "content": prompt}]
+    }
+
+def parse_bex_message(msg):
+    """Claude response for bex_request() -> parsed JSON."""
+    return _message_json(msg)
+
+def parse_with_claude(text, filename, part=None):
+    """
+    Parse izvod using Claude API.
+    
+    part: optional (index, count) when text is only one chunk of a longer izvod.
+    """
+    if not config.ANTHROPIC_API_KEY:
+        raise ValueError("ANTHROPIC_API_KEY nije konfigurisan!")
+    
+    with metrics.stage('claude', chars=len(text), part=_part_label(part)) as m:
+        msg = create_message(**izvod_request(text, filename, part))
+        metrics.record_usage(m, msg.usage)
+    return parse_izvod_message(msg)
+
+def parse_with_claude_streaming(text, filename, part=None, on_transaction=None):
+    """
+    Like parse_with_claude, but reads the response as a stream and calls
+    on_transaction(tx) for every transaction as soon as its JSON object is
+    complete - the first rows arrive long before the whole response.
+    
+    The returned dict is parsed from the complete text, as in parse_with_claude.
+    """
+    if not config.ANTHROPIC_API_KEY:
+        raise ValueError("ANTHROPIC_API_KEY nije konfigurisan!")
+    
+    received = []
+    stop_reason = [None]
+    
+    with metrics.stage('claude', chars=len(text), part=_part_label(part), streamed=True) as m:
+        started = time.perf_counter()
+        stream = create_message(stream=True, **izvod_request(text, filename, part))
+        
+        def text_deltas():
+            with stream:
+                for event in stream:
+                    if event.type == 'content_block_delta' and event.delta.type == 'text_delta':
+                        received.append(event.delta.text)
+                        yield event.delta.text
+                    elif event.type == 'message_start':
+                        metrics.record_usage(m, event.message.usage)
+                    elif event.type == 'message_delta':
+                        stop_reason[0] = event.delta.stop_reason
+                        m['tokens_out'] = event.usage.output_tokens
+        
+        deltas = text_deltas()
+        for tx in iter_json_array_items(deltas, 'transactions'):
+            if 'first_row_seconds' not in m:
+                m['first_row_seconds'] = round(time.perf_counter() - started, 4)
+            if on_transaction:
+                on_transaction(tx)
+        for _ in deltas:
+            pass  # rest of the response after the transactions array
+    
+    _check_truncated(stop_reason[0])
+    return _json_text("".join(received))
+
+def izvod_request(text, filename, part=None):
+    """Messages API parameters for parsing one izvod (or one chunk of it)."""
+    prompt = f"""Analiziraj izvod banke i izvuci podatke u JSON formatu.
+
+TEKST IZVODA:
+{text}
+
+NAZIV FAJLA: {filename}
+{_chunk_note(part)}
+Vrati SAMO JSON (bez markdown):
+
+{{
+  "statement": {{
+    "date": "DD.MM.YYYY",
+    "account": "broj-racuna-SA-SVIM-NULAMA-bez-crtica",
+    "number": "broj_izvoda",
+    "owner_name": "ime vlasnika",
+    "owner_address": "adresa",
+    "tax_number": "PIB"
+  }},
+  "transactions": [
+    {{
+      "date": "DD.MM.YYYY",
+      "customer_name": "naziv",
+      "customer_address": "adresa",
+      "customer_account": "racun-bez-crtica",
+      "customer_tax_number": "",
+      "reference": "referenca",
+      "currency": "RSD",
+      "debit": 0.00,
+      "credit": 0.00,
+      "description": "opis"
+    }}
+  ]
+}}
+
+PRAVILA:
+- debit = IZLAZI (pozitivan, credit=0)
+- credit = ULAZI (pozitivan, debit=0)
+- Račune vrati BEZ crtica (samo cifre)
+- NIKAD ne skraćuj nule u brojevima
+- date format: DD.MM.YYYY
+- Ignoriši ukupne sume"""
+    
+    return {
+        'model': config.CLAUDE_MODEL,
+        'max_tokens': IZVOD_MAX_TOKENS,
+        'messages': [{"role": "user", "content": prompt}]
+    }
+
+def parse_izvod_message(msg):
+    """Claude response for izvod_request() -> {'statement', 'transactions'}."""
+    _check_truncated(msg.stop_reason)
+    return _message_json(msg)
+
+def _check_truncated(stop_reason):
+    """A response cut off at max_tokens has lost transactions - never use it."""
+    if stop_reason == "max_tokens":
+        raise TruncatedResponse("AI odgovor je skraćen (previše transakcija)")
+
+def _message_json(msg):
+    """JSON body of a Claude response, tolerating ```json fences."""
+    return _json_text(msg.content[0].text)
+
+def _json_text(raw):
+    """Response text (possibly fenced) -> parsed JSON."""
+    clean = raw.replace('```json', '').replace('```', '').strip()
+    return json.loads(clean)
+
+def iter_json_array_items(chunks, key):
+    """
+    Incremental JSON parsing of streamed text: yields each object of the
+    array under "key" as soon as its closing brace arrives. Brace counting
+    is string- and escape-aware; stops when the array closes. Objects that
+    are not valid JSON are skipped (the full response is parsed afterwards).
+    """
+    key_re = re.compile(r'"%s"\s*:\s*\[' % re.escape(key))
+    buffer = ""
+    pos = None  # scan position inside the array, None until the array starts
+    depth = 0
+    start = 0
+    in_string = False
+    escaped = False
+    
+    for chunk in chunks:
+        buffer += chunk
+        if pos is None:
+            match = key_re.search(buffer)
+            if match is None:
+                continue
+            pos = match.end()
+        
+        while pos < len(buffer):
+            ch = buffer[pos]
+            if in_string:
+                if escaped:
+                    escaped = False
+                elif ch == '\\':
+                    escaped = True
+                elif ch == '"':
+                    in_string = False
+            elif ch == '"':
+                in_string = True
+            elif ch in '{[':
+                if depth == 0:
+                    start = pos
+                depth += 1
+            elif ch in '}]':
+                if depth == 0:
+                    return  # end of the array itself
+                depth -= 1
+                if depth == 0:
+                    try:
+                        yield json.loads(buffer[start:pos + 1])
+                    except ValueError:
+                        pass
+            pos += 1
+
+def _part_label(part):
+    """'2/5' for chunk metrics, None for a whole izvod."""
+    return None if part is None else f"{part[0] + 1}/{part[1]}"
+
+def _chunk_note(part):
+    """Extra prompt instructions when Claude only sees one chunk of the izvod."""
+    if part is None:
+        return ""
+    index, count = part
+    return (f"\nNAPOMENA: Ovo je deo {index + 1} od {count} istog izvoda. "
+            "Izvuci SVE transakcije iz ovog dela. Podatke zaglavlja (statement) "
+            "popuni samo ako se vide u ovom delu, inače ostavi prazne stringove.\n")
+
+def parse_with_claude_chunked(pages, filename, pages_per_chunk=None, max_workers=None,
+                              on_transaction=None):
+    """
+    Parse a long izvod in page groups, all chunks in parallel.
+    
+    Each chunk is a separate Claude call, so latency follows the largest chunk
+    and no single response has to fit all transactions. Chunk results are
+    merged back into the same {'statement', 'transactions'} dict.
+    
+    on_transaction: stream every chunk and report rows as they arrive (called
+    from the chunk worker threads, in arrival order; None when the rows of
+    the file so far are void - see parse_izvod_text)
+    """
+    chunks = split_pages(pages, pages_per_chunk)
+    if len(chunks) == 1:
+        return parse_izvod_text(chunks[0], filename, on_transaction=on_transaction)
+    
+    with ThreadPoolExecutor(max_workers=max_workers or config.CHUNK_WORKERS) as pool:
+        futures = [
+            metrics.submit(pool, parse_izvod_text, chunk, filename, (i, len(chunks)), on_transaction)
+            for i, chunk in enumerate(chunks)
+        ]
+        # Any failing chunk fails the whole izvod - a partial statement is worse than none
+        parts = [future.result() for future in futures]
+    
+    return merge_parsed_chunks(parts)
+
+def parse_izvod_text(text, filename, part=None, on_transaction=None, depth=0):
+    """
+    parse_with_claude, streamed when there is an on_transaction callback. A
+    response cut off at max_tokens is parsed again in halves (parse_truncated);
+    when streamed, on_transaction(None) first tells the caller that the rows
+    it got for this file so far are void.
+    """
+    try:
+        if on_transaction is None:
+            return parse_with_claude(text, filename, part)
+        return parse_with_claude_streaming(text, filename, part, on_transaction)
+    except TruncatedResponse:
+        if on_transaction is not None:
+            on_transaction(None)
+        return parse_truncated(text, filename, part, depth)
+
+def parse_truncated(text, filename, part=None, depth=0):
+    """
+    Parse text whose response was cut off at max_tokens as two halves, in
+    parallel, splitting again (up to MAX_SPLIT_DEPTH) while still too long.
+    part: the chunk the text is (kept for the halves), None for a whole izvod.
+    """
+    halves = split_text(text)
+    if depth >= MAX_SPLIT_DEPTH or len(halves) < 2:
+        raise TruncatedResponse(f"AI odgovor je skraćen (previše transakcija) i posle deljenja "
+                                f"teksta na {2 ** depth} dela - smanji CHUNK_PAGES")
+    
+    # Halves are not streamed: their rows come with the finished file
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        futures = [
+            metrics.submit(pool, parse_izvod_text, half, filename, part or (k, 2), None, depth + 1)
+            for k, half in enumerate(halves)
+        ]
+        parts = [future.result() for future in futures]
+    return merge_parsed_chunks(parts)
+
+def split_text(text):
+    """
+    Text -> two halves, cut at the page break (blank line) nearest the
+    middle when there is one near it, else at the middle line.
+    """
+    lines = text.splitlines(keepends=True)
+    if len(lines) < 2:
+        return [text]
+    middle = len(lines) // 2
+    breaks = [i for i in range(1, len(lines)) if not lines[i - 1].strip() and lines[i].strip()]
+    cut = min(breaks, key=lambda i: abs(i - middle)) if breaks else middle
+    if abs(cut - middle) > len(lines) // 4:
+        cut = middle
+    return ["".join(lines[:cut]), "".join(lines[cut:])]
+
+def split_pages(pages, pages_per_chunk=None):
+    """Page texts -> chunk texts of pages_per_chunk pages (one chunk if short or 0)."""
+    pages_per_chunk = pages_per_chunk or config.CHUNK_PAGES
+    if pages_per_chunk <= 0 or len(pages) <= pages_per_chunk:
+        return ["".join(pages)]
+    return ["".join(pages[i:i + pages_per_chunk])
+            for i in range(0, len(pages), pages_per_chunk)]
+
+def merge_parsed_chunks(parts):
+    """Merge chunk results in page order: first non-empty header field wins."""
+    statement = {}
+    transactions = []
+    
+    for part in parts:
+        for key, value in (part.get('statement') or {}).items():
+            if value and not statement.get(key):
+                statement[key] = value
+            else:
+                statement.setdefault(key, value)
+        transactions.extend(part.get('transactions') or [])
+    
+    return {
+        'statement': statement,
+        'transactions': transactions
+    }
@@ -0,0 +1,133 @@
+"""
+Batch CLI
+=========
+Converts a folder of izvodi without a browser (cron, scripts):
+
+    python -m minimax izvodi/ --specs specifikacije/ --format both
+
+Outputs are written next to the inputs. Izvodi already in the ledger (see
+minimax.ledger) are loaded from it instead of being parsed again. Exit code
+is 0 when every file was converted, 1 when any izvod or specification failed.
+"""
+
+import argparse
+import logging
+import sys
+from pathlib import Path
+
+from . import config, metrics
+from .export import write_minimax_xml
+from .pipeline import convert_uploads, output_filename, render_output
+
+IZVOD_SUFFIXES = {'.pdf', '.xml'}
+SPEC_SUFFIXES = {'.pdf', '.csv'}
+
+def find_files(directory, suffixes):
+    """Input files in directory (not recursive), skipping our own *_minimax outputs."""
+    return sorted(
+        path for path in Path(directory).iterdir()
+        if path.is_file() and path.suffix.lower() in suffixes and not path.stem.endswith('_minimax')
+    )
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog="python -m minimax",
+        description="Pretvara izvode (PDF/XML) iz foldera u Minimax Excel/XML sa BEX razbijanjem."
+    )
+    parser.add_argument("izvodi", type=Path, help="folder sa izvodima (PDF ili XML)")
+    parser.add_argument("--specs", type=Path, help="folder sa BEX specifikacijama (PDF ili CSV)")
+    parser.add_argument("--format", choices=["excel", "xml", "both"], default="excel",
+                        help="izlazni format (podrazumevano: excel)")
+    parser.add_argument("--workers", type=int, default=None,
+                        help=f"broj izvoda koji se obrađuju istovremeno (podrazumevano: {config.MAX_WORKERS})")
+    parser.add_argument("--processes", action="store_true",
+                        help="koristi procese umesto niti (za velike XML/PDF fajlove bez AI)")
+    parser.add_argument("--extract-workers", type=int, default=None, metavar="N",
+                        help="izvlači tekst dugih PDF izvoda u N procesa, po stranama "
+                             f"(podrazumevano: {config.EXTRACT_WORKERS} = bez procesa)")
+    parser.add_argument("--batch", action="store_true",
+                        help="pošalji sve AI zahteve kao jedan Message Batch (upola jeftinije, "
+                             "rezultat za nekoliko minuta do 24h)")
+    parser.add_argument("--no-cache", action="store_true", help="ne koristi keš AI rezultata")
+    parser.add_argument("--no-chunks", action="store_true", help="ne deli duge PDF izvode na delove")
+    parser.add_argument("--no-ledger", action="store_true",
+                        help="obradi ponovo i izvode koji su već u bazi obrađenih izvoda")
+    parser.add_argument("--metrics", type=Path, metavar="FAJL",
+                        help="upisuj merenja po fazama (JSON lines) u FAJL")
+    parser.add_argument("-v", "--verbose", action="store_true", help="detaljniji ispis")
+    return parser
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.WARNING,
+                        format="%(levelname)s %(name)s: %(message)s")
+    
+    for folder in (args.izvodi, args.specs):
+        if folder is not None and not folder.is_dir():
+            print(f"GRESKA: {folder} nije folder", file=sys.stderr)
+            return 1
+    
+    if args.metrics:
+        config.METRICS_LOG = str(args.metrics)
+    if args.extract_workers is not None:
+        config.EXTRACT_WORKERS = args.extract_workers
+    
+    formats = {"excel": ["Excel"], "xml": ["XML"], "both": ["Excel", "XML"]}[args.format]
+    failures = 0
+    
+    spec_paths = find_files(args.specs, SPEC_SUFFIXES) if args.specs else []
+    izvod_paths = find_files(args.izvodi, IZVOD_SUFFIXES)
+    if not izvod_paths:
+        print(f"GRESKA: nema izvoda u {args.izvodi}", file=sys.stderr)
+        return 1
+    paths = iter(izvod_paths)
+    
+    def on_message(kind, text):
+        nonlocal failures
+        if kind == 'error':
+            # A specification that couldn't be read
+            failures += 1
+            print(text, file=sys.stderr)
+        else:
+            print(text)
+    
+    def on_progress(done, total, text):
+        if args.batch:
+            print(text, file=sys.stderr)
+    
+    def on_result(result):
+        nonlocal failures
+        path = next(paths)
+        if not result['success']:
+            failures += 1
+            print(f"GRESKA {path.name}: {result['error']}", file=sys.stderr)
+            return
+        try:
+            write_outputs(path, result, formats)
+        except Exception as e:
+            failures += 1
+            print(f"GRESKA {path.name}: {e}", file=sys.stderr)
+    
+    convert_uploads(
+        [(path.name, path.read_bytes()) for path in izvod_paths],
+        [(path.name, path.read_bytes()) for path in spec_paths],
+        max_workers=args.workers, use_cache=not args.no_cache, chunked=not args.no_chunks,
+        use_ledger=not args.no_ledger, batch=args.batch, processes=args.processes,
+        on_message=on_message, on_progress=on_progress, on_result=on_result
+    )
+    return 1 if failures else 0
+
+def write_outputs(path, converted, formats):
+    """Write a converted izvod's files next to its input, one line per file written."""
+    statement, transactions = converted['statement'], converted['transactions']
+    with metrics.labels(file=path.name):
+        for output_format in formats:
+            out_path = path.with_name(output_filename(path.name, output_format))
+            if output_format == "XML":
+                with open(out_path, 'wb') as f:
+                    write_minimax_xml(statement, transactions, f)
+            else:
+                out_path.write_bytes(render_output(statement, transactions, output_format))
+            print(f"OK {path.name} -> {out_path.name} ({len(transactions)} transakcija"
+                  + (", BEX razbijen" if converted['bex_expanded'] else "")
+                  + (", iz baze" if converted.get('from_ledger') else "") + ")")
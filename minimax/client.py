@@ -0,0 +1,161 @@
+"""
+Claude client
+=============
+One pooled Anthropic client per process, shared by every session and worker
+thread, plus a shared request rate limiter (token bucket) and retries with
+jittered exponential backoff that honour the API's retry-after header.
+
+The SDK's own retries are disabled (max_retries=0) so that every attempt,
+including retries, goes through the limiter. The SDK itself is imported on
+first use - it takes seconds to load, and the app's login screen, XML
+izvodi and CSV specs never need it.
+"""
+
+import logging
+import random
+import threading
+import time
+
+from . import config
+
+logger = logging.getLogger(__name__)
+
+# Status codes worth retrying: timeouts, conflicts, rate limits, overload/5xx
+RETRY_STATUS = {408, 409, 429}
+BACKOFF_BASE = 1.0   # seconds, doubled per attempt
+BACKOFF_CAP = 60.0   # max wait between attempts
+
+_client = None
+_client_key = None  # (api key, base url) the client was built for
+_client_lock = threading.Lock()
+
+# Token bucket: one token per request, refilled at CLAUDE_RPM per minute.
+# 'paused_until' is set from a 429 retry-after so all threads back off together.
+_bucket = {'tokens': None, 'updated': 0.0, 'paused_until': 0.0}
+_bucket_lock = threading.Lock()
+
+def get_client():
+    """
+    The process-wide Claude client (created on first use, recreated when the
+    API key or ANTHROPIC_BASE_URL changes). Its connection pool is sized for
+    CLAUDE_POOL_SIZE concurrent requests, so TLS connections are reused.
+    
+    ANTHROPIC_BASE_URL points the client at another endpoint - a proxy, or a
+    local fake server when testing.
+    """
+    global _client, _client_key
+    
+    if not config.ANTHROPIC_API_KEY:
+        raise ValueError("ANTHROPIC_API_KEY nije konfigurisan!")
+    
+    key = (config.ANTHROPIC_API_KEY, config.ANTHROPIC_BASE_URL)
+    with _client_lock:
+        if _client is None or _client_key != key:
+            import anthropic
+            
+            # Limits class of whichever httpx build the SDK ships with
+            limits_type = type(anthropic.DEFAULT_CONNECTION_LIMITS)
+            pool_size = max(config.CLAUDE_POOL_SIZE, 1)
+            _client = anthropic.Anthropic(
+                api_key=config.ANTHROPIC_API_KEY,
+                base_url=config.ANTHROPIC_BASE_URL or None,
+                max_retries=0,
+                http_client=anthropic.DefaultHttpxClient(
+                    limits=limits_type(max_connections=pool_size,
+                                       max_keepalive_connections=pool_size)
+                ),
+            )
+            _client_key = key
+        return _client
+
+def acquire_request_slot():
+    """Block until the shared rate limit allows one more request (CLAUDE_RPM <= 0 disables it)."""
+    rate = config.CLAUDE_RPM / 60.0
+    if rate <= 0:
+        return
+    capacity = max(config.CLAUDE_RPM / 6.0, 1.0)  # burst: 10 seconds' worth
+    
+    while True:
+        with _bucket_lock:
+            now = time.monotonic()
+            if _bucket['tokens'] is None:
+                _bucket['tokens'] = capacity
+            else:
+                elapsed = now - _bucket['updated']
+                _bucket['tokens'] = min(capacity, _bucket['tokens'] + elapsed * rate)
+            _bucket['updated'] = now
+            
+            if now >= _bucket['paused_until'] and _bucket['tokens'] >= 1:
+                _bucket['tokens'] -= 1
+                return
+            wait = max(_bucket['paused_until'] - now, (1 - _bucket['tokens']) / rate)
+        
+        time.sleep(wait)
+
+def pause_requests(seconds):
+    """Hold back every thread's next request for `seconds` (server asked us to)."""
+    with _bucket_lock:
+        _bucket['paused_until'] = max(_bucket['paused_until'], time.monotonic() + seconds)
+        _bucket['tokens'] = 0.0
+
+def _retry_after(error):
+    """Seconds from the retry-after(-ms) response headers, or None."""
+    response = getattr(error, 'response', None)
+    if response is None:
+        return None
+    headers = response.headers
+    try:
+        if headers.get('retry-after-ms'):
+            return float(headers['retry-after-ms']) / 1000
+        if headers.get('retry-after'):
+            return float(headers['retry-after'])
+    except ValueError:
+        pass  # HTTP-date form - fall back to our own backoff
+    return None
+
+def _is_retryable(error):
+    """Rate limits, overload, 5xx and connection problems - not bad requests."""
+    import anthropic
+    
+    if isinstance(error, anthropic.APIConnectionError):
+        return True
+    if isinstance(error, anthropic.APIStatusError):
+        return error.status_code in RETRY_STATUS or error.status_code >= 500
+    return False
+
+def backoff_delay(attempt, retry_after=None):
+    """Full-jitter exponential backoff, never shorter than the server's retry-after."""
+    delay = random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * 2 ** attempt))
+    if retry_after is not None:
+        delay = max(delay, retry_after)
+    return delay
+
+def create_message(**kwargs):
+    """client.messages.create() through the shared limiter and retries."""
+    return call_api(get_client().messages.create, **kwargs)
+
+def call_api(method, *args, **kwargs):
+    """
+    Call an SDK method through the shared limiter, retried up to
+    CLAUDE_MAX_RETRIES times on rate limits, overload and connection errors.
+    """
+    import anthropic
+    
+    attempt = 0
+    
+    while True:
+        acquire_request_slot()
+        try:
+            return method(*args, **kwargs)
+        except anthropic.APIError as e:
+            if not _is_retryable(e) or attempt >= config.CLAUDE_MAX_RETRIES:
+                raise
+            retry_after = _retry_after(e)
+            delay = backoff_delay(attempt, retry_after)
+            if retry_after is not None:
+                pause_requests(retry_after)
+            logger.warning("Claude %s, retry %d/%d in %.1fs",
+                           getattr(e, 'status_code', type(e).__name__),
+                           attempt + 1, config.CLAUDE_MAX_RETRIES, delay)
+            time.sleep(delay)
+            attempt += 1
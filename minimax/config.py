@@ -0,0 +1,123 @@
+"""
+Runtime settings
+================
+Defaults below, overridden from environment variables and from any mapping
+passed to load() (the Streamlit app passes st.secrets, the CLI its options).
+Other modules read settings as `config.NAME` at call time, so overrides
+apply everywhere.
+"""
+
+import os
+import tempfile
+
+ANTHROPIC_API_KEY = ""
+CLAUDE_MODEL = "claude-sonnet-4-20250514"
+# Alternative API endpoint (proxy, local fake server); empty = SDK default
+ANTHROPIC_BASE_URL = ""
+
+# Max number of izvodi parsed at the same time (Claude calls in flight)
+MAX_WORKERS = 4
+
+# App conversions run as background jobs: at most JOB_WORKERS at once for the
+# whole process, and at most JOB_QUEUE_PER_USER waiting per user
+JOB_WORKERS = 2
+JOB_QUEUE_PER_USER = 3
+
+# On-disk cache of AI parse results
+CACHE_DIR = ".cache/parse"
+CACHE_MAX_MB = 200
+
+# Long PDF izvodi are parsed in chunks of CHUNK_PAGES pages (0 = never chunk)
+CHUNK_PAGES = 3
+CHUNK_WORKERS = 4
+
+# PDF text extraction in a process pool of EXTRACT_WORKERS processes (shared
+# by all files, 0 = in the calling thread), for PDFs of at least
+# EXTRACT_MIN_PAGES pages - shorter ones aren't worth the hand-off
+EXTRACT_WORKERS = 0
+EXTRACT_MIN_PAGES = 8
+
+# Normalize extracted PDF text before prompting (drop lines repeated on
+# every page, collapse whitespace); optionally also drop notice/legal sections
+NORMALIZE_TEXT = True
+NORMALIZE_DROP_SECTIONS = False
+
+# Claude API: shared connection pool size, request rate limit (requests per
+# minute across all sessions, 0 = unlimited) and retries on 429/overload
+CLAUDE_POOL_SIZE = 16
+CLAUDE_RPM = 50
+CLAUDE_MAX_RETRIES = 5
+
+# Batch mode (Message Batches API): seconds between status polls, and how
+# long to wait for a batch before giving up
+BATCH_POLL_SECONDS = 10
+BATCH_TIMEOUT_SECONDS = 24 * 3600
+
+# Per-stage metrics as JSON lines appended to this file (empty = only the
+# "minimax.metrics" logger)
+METRICS_LOG = ""
+
+# Debit/credit rules table (JSON, see minimax/classify.py); empty = the
+# bundled minimax/classify_rules.json
+CLASSIFY_RULES = ""
+
+# SQLite ledger of converted izvodi - already processed statements are loaded
+# from it instead of being converted again (empty = off)
+LEDGER_PATH = ".cache/ledger.sqlite3"
+
+# Generated files (and transaction lists over the session memory cap) of the
+# app's sessions: directory, whole-store size limit, and how long an idle
+# session's files are kept. SESSION_MEMORY_MB caps the transaction lists and
+# previews a session holds in memory - the oldest go to disk beyond it.
+OUTPUT_DIR = os.path.join(tempfile.gettempdir(), "minimax-outputs")
+OUTPUT_MAX_MB = 2000
+OUTPUT_TTL_MINUTES = 120
+SESSION_MEMORY_MB = 100
+
+def _flag(value):
+    """Boolean setting from bool/int or a string like "0", "false", "ne"."""
+    if isinstance(value, str):
+        return value.strip().lower() not in ("0", "false", "no", "ne", "off")
+    return bool(value)
+
+# Setting name -> type, for values coming in as strings
+SETTINGS = {
+    'ANTHROPIC_API_KEY': str,
+    'CLAUDE_MODEL': str,
+    'ANTHROPIC_BASE_URL': str,
+    'MAX_WORKERS': int,
+    'JOB_WORKERS': int,
+    'JOB_QUEUE_PER_USER': int,
+    'CACHE_DIR': str,
+    'CACHE_MAX_MB': int,
+    'CHUNK_PAGES': int,
+    'CHUNK_WORKERS': int,
+    'EXTRACT_WORKERS': int,
+    'EXTRACT_MIN_PAGES': int,
+    'NORMALIZE_TEXT': _flag,
+    'NORMALIZE_DROP_SECTIONS': _flag,
+    'CLAUDE_POOL_SIZE': int,
+    'CLAUDE_RPM': int,
+    'CLAUDE_MAX_RETRIES': int,
+    'BATCH_POLL_SECONDS': float,
+    'BATCH_TIMEOUT_SECONDS': float,
+    'METRICS_LOG': str,
+    'CLASSIFY_RULES': str,
+    'LEDGER_PATH': str,
+    'OUTPUT_DIR': str,
+    'OUTPUT_MAX_MB': int,
+    'OUTPUT_TTL_MINUTES': int,
+    'SESSION_MEMORY_MB': int,
+}
+
+def load(source):
+    """Override settings from a mapping (os.environ, st.secrets, dict)."""
+    for name, cast in SETTINGS.items():
+        if name in source and source[name] not in (None, ""):
+            globals()[name] = cast(source[name])
+
+def snapshot():
+    """Current settings as a dict - e.g. to re-apply them in worker processes."""
+    return {name: globals()[name] for name in SETTINGS}
+
+load(os.environ)
@@ -0,0 +1,143 @@
+"""
+Background jobs
+===============
+Process-wide scheduler for conversions, so they run outside the Streamlit
+script thread: a dropped connection or a rerun no longer throws the work
+away, and a reloaded page finds its job again by id.
+
+    job = jobs.submit(user, work, inputs_key=...)   # work(job) runs on a worker thread
+    job = jobs.get(job_id)                          # status, progress, results so far
+
+At most JOB_WORKERS jobs run at once across all sessions, so peak-hour
+clicks queue instead of all hitting the API together. Queued jobs are taken
+fairly: one per user in turn, so a user who submits a whole month doesn't
+hold everyone else back. Finished jobs are kept for OUTPUT_TTL_MINUTES, as
+long as their files in the output store.
+"""
+
+import collections
+import itertools
+import logging
+import threading
+import time
+import uuid
+
+from . import config, metrics
+
+logger = logging.getLogger(__name__)
+
+# Streamed rows a job keeps for the live table (the newest ones)
+LIVE_ROWS = 200
+
+_lock = threading.Condition()
+_queues = collections.OrderedDict()  # user -> deque of queued jobs; first user's turn is next
+_jobs = {}  # job id -> Job
+_workers = []
+
+class Job:
+    """
+    One submitted piece of work and what it has reported so far. The worker
+    thread writes, the UI reads: fields are only appended to or replaced
+    whole, so readers need no lock.
+    """
+    
+    def __init__(self, user, work, data):
+        self.id = uuid.uuid4().hex[:16]
+        self.user = user
+        self.work = work
+        self.data = data  # submitter's own values (inputs key, output format, ...)
+        self.status = 'queued'  # queued, running, done, failed
+        self.submitted = time.time()
+        self.started = None
+        self.finished = None
+        self.progress = (0, 0, '')  # done, total, text
+        self.messages = []  # (kind, text), kind 'info', 'success' or 'error'
+        self.files = {}  # upload index -> status
+        self.live_rows = collections.deque(maxlen=LIVE_ROWS)
+        self.results = []  # results as they are ready
+        self.metrics = []  # stage records of the run
+        self.error = None
+    
+    @property
+    def active(self):
+        return self.status in ('queued', 'running')
+    
+    def message(self, kind, text):
+        self.messages.append((kind, text))
+    
+    def set_progress(self, done, total, text=''):
+        self.progress = (done, total, text)
+    
+    def set_file(self, index, status):
+        self.files[index] = status
+
+def submit(user, work, **data):
+    """
+    Queue work(job) for a worker thread and return the Job. Raises
+    ValueError when the user already has JOB_QUEUE_PER_USER jobs waiting.
+    """
+    with _lock:
+        _expire()
+        queue = _queues.get(user)
+        if queue and len(queue) >= config.JOB_QUEUE_PER_USER:
+            raise ValueError(f"Već imaš {len(queue)} obrade u redu - sačekaj da se završe")
+        
+        job = Job(user, work, data)
+        _jobs[job.id] = job
+        _queues.setdefault(user, collections.deque()).append(job)
+        while len(_workers) < max(1, config.JOB_WORKERS):
+            worker = threading.Thread(target=_work, name=f"minimax-job-{len(_workers)}", daemon=True)
+            worker.start()
+            _workers.append(worker)
+        _lock.notify()
+    return job
+
+def get(job_id):
+    """Job by id (queued, running or finished and not yet expired), or None."""
+    with _lock:
+        return _jobs.get(job_id)
+
+def position(job):
+    """Jobs that start before a queued job (0 once it runs)."""
+    with _lock:
+        if job.status != 'queued':
+            return 0
+        order = [
+            queued
+            for round_ in itertools.zip_longest(*_queues.values())
+            for queued in round_ if queued is not None
+        ]
+        return order.index(job)
+
+def _work():
+    """Worker thread: take jobs fairly and run them, forever."""
+    while True:
+        with _lock:
+            while not _queues:
+                _lock.wait()
+            # The user whose turn it is gets one job started and goes to the back
+            user, queue = _queues.popitem(last=False)
+            job = queue.popleft()
+            if queue:
+                _queues[user] = queue
+            job.status = 'running'
+            job.started = time.time()
+        
+        try:
+            with metrics.collect(job.metrics), metrics.labels(job=job.id):
+                job.work(job)
+            job.status = 'done'
+        except Exception as e:
+            logger.exception("Obrada %s nije uspela", job.id)
+            job.error = str(e)
+            job.status = 'failed'
+        finally:
+            job.work = None  # drops the uploads it closed over
+            job.finished = time.time()
+
+def _expire():
+    """Forget finished jobs older than OUTPUT_TTL_MINUTES (called with _lock held)."""
+    expired = time.time() - config.OUTPUT_TTL_MINUTES * 60
+    for job_id, job in list(_jobs.items()):
+        if job.finished is not None and job.finished < expired:
+            del _jobs[job_id]
@@ -0,0 +1,291 @@
+"""
+Ledger
+======
+Local SQLite store of converted izvodi: statement, final transactions (after
+BEX expansion and the debit/credit fix) and the BEX specifications each
+statement consumed. Lets re-uploaded statements load straight from the
+database instead of going through the pipeline again, and answers queries
+across months (by account, statement number, date).
+
+A statement is known by the hash of its file and by (account, statement
+number), so the same izvod exported twice (PDF and XML, or re-downloaded)
+is recognized too. A stored statement counts only while the debit/credit
+rules table it was built with is unchanged (its version is stored with it);
+a spec that arrived later for one of its BEX payouts is caught by the
+pipeline (bex.matches_unused_spec()). Like the parse cache the ledger is
+best-effort: database errors are logged and never fail a conversion.
+LEDGER_PATH = "" turns it off.
+"""
+
+import hashlib
+import json
+import logging
+import sqlite3
+from contextlib import closing, contextmanager
+from datetime import datetime
+from pathlib import Path
+
+from . import config
+from .bex import parse_date
+from .classify import load_rules, normalize_account
+from .transaction import FIELDS as TRANSACTION_COLUMNS, Transaction, to_cents
+
+logger = logging.getLogger(__name__)
+
+# Version of the schema below, stored as PRAGMA user_version
+SCHEMA_VERSION = 1
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS statements (
+    id INTEGER PRIMARY KEY,
+    account TEXT NOT NULL,
+    number TEXT NOT NULL,
+    day TEXT,
+    filename TEXT NOT NULL,
+    statement TEXT NOT NULL,
+    bex_expanded INTEGER NOT NULL,
+    processed_at TEXT NOT NULL,
+    rules_version TEXT
+);
+CREATE UNIQUE INDEX IF NOT EXISTS statements_account_number ON statements (account, number);
+CREATE INDEX IF NOT EXISTS statements_day ON statements (day);
+
+CREATE TABLE IF NOT EXISTS statement_files (
+    file_hash TEXT PRIMARY KEY,
+    statement_id INTEGER NOT NULL REFERENCES statements (id) ON DELETE CASCADE
+);
+
+-- Amounts in para (cents)
+CREATE TABLE IF NOT EXISTS transactions (
+    statement_id INTEGER NOT NULL REFERENCES statements (id) ON DELETE CASCADE,
+    position INTEGER NOT NULL,
+    date TEXT, customer_name TEXT, customer_address TEXT, customer_account TEXT,
+    customer_tax_number TEXT, reference TEXT, currency TEXT,
+    debit INTEGER, credit INTEGER, description TEXT,
+    PRIMARY KEY (statement_id, position)
+);
+
+CREATE TABLE IF NOT EXISTS spec_usage (
+    spec_name TEXT NOT NULL,
+    spec_total INTEGER NOT NULL,
+    statement_id INTEGER NOT NULL REFERENCES statements (id) ON DELETE CASCADE,
+    PRIMARY KEY (spec_name, spec_total)
+);
+""" + f"PRAGMA user_version = {SCHEMA_VERSION};\n"
+
+def file_hash(file_bytes):
+    """Identity of an uploaded file."""
+    return hashlib.sha256(file_bytes).hexdigest()
+
+@contextmanager
+def _connect():
+    """
+    Connection to the ledger (schema created on first use), committed on
+    success; None when the ledger is turned off. A fresh connection per use
+    keeps it safe to call from any thread.
+    """
+    if not config.LEDGER_PATH:
+        yield None
+        return
+    
+    path = Path(config.LEDGER_PATH)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with closing(sqlite3.connect(path, timeout=30)) as conn:
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA foreign_keys = ON")
+        conn.execute("PRAGMA journal_mode = WAL")
+        conn.executescript(SCHEMA)
+        with conn:
+            yield conn
+
+# ========================================================================
+# DEDUPE
+# ========================================================================
+
+def find_file(file_bytes, filename):
+    """Converted izvod for a file processed before (same bytes, same rules), or None."""
+    try:
+        with _connect() as conn:
+            if conn is None:
+                return None
+            row = conn.execute(
+                "SELECT s.* FROM statement_files f JOIN statements s ON s.id = f.statement_id "
+                "WHERE f.file_hash = ? AND s.rules_version = ?", (file_hash(file_bytes), _rules_version())
+            ).fetchone()
+            return _load_converted(conn, row, filename) if row else None
+    except (sqlite3.Error, OSError) as e:
+        logger.warning("Ledger nedostupan: %s", e)
+        return None
+
+def find_statement(statement, file_bytes, filename):
+    """
+    Converted izvod for a statement processed before from another file (same
+    account and statement number), or None. The file is remembered, so the
+    next upload of it is found by find_file() without parsing.
+    """
+    account, number = _statement_key(statement)
+    if not account or not number:
+        return None
+    try:
+        with _connect() as conn:
+            if conn is None:
+                return None
+            row = conn.execute("SELECT * FROM statements WHERE account = ? AND number = ? AND rules_version = ?",
+                               (account, number, _rules_version())).fetchone()
+            if row is None:
+                return None
+            conn.execute("INSERT OR REPLACE INTO statement_files (file_hash, statement_id) VALUES (?, ?)",
+                         (file_hash(file_bytes), row['id']))
+            return _load_converted(conn, row, filename)
+    except (sqlite3.Error, OSError) as e:
+        logger.warning("Ledger nedostupan: %s", e)
+        return None
+
+def save(converted, file_bytes, specifications=None):
+    """
+    Store a converted izvod, replacing an earlier version of the same
+    statement or file. specifications: the BEX specs it was expanded with
+    (for the totals of the specs in converted['bex_specs']).
+    """
+    statement = converted['statement']
+    account, number = _statement_key(statement)
+    specifications = specifications or {}
+    try:
+        with _connect() as conn:
+            if conn is None:
+                return
+            digest = file_hash(file_bytes)
+            conn.execute(
+                "DELETE FROM statements WHERE (account = ? AND number = ? AND number != '') "
+                "OR id IN (SELECT statement_id FROM statement_files WHERE file_hash = ?)",
+                (account, number, digest)
+            )
+            statement_id = conn.execute(
+                "INSERT INTO statements (account, number, day, filename, statement, bex_expanded, processed_at, "
+                "rules_version) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (account, number or f"#{digest[:16]}", _day(statement.get('date')), converted['filename'],
+                 json.dumps(statement, ensure_ascii=False), int(converted['bex_expanded']),
+                 datetime.now().isoformat(timespec='seconds'), _rules_version())
+            ).lastrowid
+            conn.execute("INSERT INTO statement_files (file_hash, statement_id) VALUES (?, ?)",
+                         (digest, statement_id))
+            conn.executemany(
+                f"INSERT INTO transactions (statement_id, position, {', '.join(TRANSACTION_COLUMNS)}) "
+                f"VALUES (?, ?, {', '.join('?' * len(TRANSACTION_COLUMNS))})",
+                (
+                    (statement_id, position) + tuple(getattr(tx, c) for c in TRANSACTION_COLUMNS)
+                    for position, tx in enumerate(converted['transactions'])
+                )
+            )
+            conn.executemany(
+                "INSERT OR REPLACE INTO spec_usage (spec_name, spec_total, statement_id) VALUES (?, ?, ?)",
+                (
+                    (name, sum(to_cents(c['amount']) for c in specifications[name]), statement_id)
+                    for name in converted.get('bex_specs', ()) if name in specifications
+                )
+            )
+    except (sqlite3.Error, OSError) as e:
+        logger.warning("Izvod %s nije upisan u ledger: %s", converted['filename'], e)
+
+def mark_used_specs(spec_index):
+    """
+    Mark specs of a build_spec_index() result that earlier statements already
+    consumed (same name and total) as used, so a re-uploaded spec is never
+    matched to a second payout. Returns the names marked.
+    """
+    totals = spec_index['totals']
+    if not totals:
+        return set()
+    try:
+        with _connect() as conn:
+            if conn is None:
+                return set()
+            used = {
+                name for name, total in conn.execute("SELECT spec_name, spec_total FROM spec_usage")
+                if totals.get(name) == total
+            }
+    except (sqlite3.Error, OSError) as e:
+        logger.warning("Ledger nedostupan: %s", e)
+        return set()
+    spec_index['used'].update(used)
+    return used
+
+# ========================================================================
+# QUERIES
+# ========================================================================
+
+def list_statements(account=None, date_from=None, date_to=None):
+    """
+    Processed statements, newest first, with transaction count and debit and
+    credit totals (in para). date_from/date_to: datetime.date or 'YYYY-MM-DD'
+    (inclusive).
+    """
+    where, params = _filters(account, date_from, date_to)
+    try:
+        with _connect() as conn:
+            if conn is None:
+                return []
+            rows = conn.execute(
+                "SELECT s.id, s.account, s.number, s.day, s.filename, s.bex_expanded, s.processed_at, "
+                "COUNT(t.position) AS transactions, COALESCE(SUM(t.debit), 0) AS debit, "
+                "COALESCE(SUM(t.credit), 0) AS credit "
+                f"FROM statements s LEFT JOIN transactions t ON t.statement_id = s.id {where} "
+                "GROUP BY s.id ORDER BY s.day DESC, s.number DESC", params
+            ).fetchall()
+    except (sqlite3.Error, OSError) as e:
+        logger.warning("Ledger nedostupan: %s", e)
+        return []
+    return [dict(row) for row in rows]
+
+def _filters(account, date_from, date_to):
+    """WHERE clause on account and statement day range for list_statements()."""
+    clauses, params = [], []
+    if account:
+        clauses.append("s.account = ?")
+        params.append(normalize_account(account))
+    if date_from:
+        clauses.append("s.day >= ?")
+        params.append(str(date_from))
+    if date_to:
+        clauses.append("s.day <= ?")
+        params.append(str(date_to))
+    return ("WHERE " + " AND ".join(clauses) if clauses else ""), params
+
+def _load_converted(conn, row, filename):
+    """convert_izvod()-shaped result for a stored statement, named after the new upload."""
+    transactions = [
+        Transaction(*tx)
+        for tx in conn.execute(
+            f"SELECT {', '.join(TRANSACTION_COLUMNS)} FROM transactions "
+            "WHERE statement_id = ? ORDER BY position", (row['id'],)
+        )
+    ]
+    bex_specs = [r[0] for r in conn.execute("SELECT spec_name FROM spec_usage WHERE statement_id = ?",
+                                            (row['id'],))]
+    return {
+        'filename': filename,
+        'statement': json.loads(row['statement']),
+        'transactions': transactions,
+        'bex_expanded': bool(row['bex_expanded']),
+        'bex_specs': bex_specs,
+        'outputs': {},
+        'from_ledger': row['processed_at'],
+    }
+
+def _rules_version():
+    """Version of the debit/credit rules table in effect (None if it can't be read - nothing matches)."""
+    try:
+        return load_rules()['version']
+    except (OSError, ValueError) as e:
+        logger.warning("Pravila klasifikacije nedostupna: %s", e)
+        return None
+
+def _statement_key(statement):
+    """(normalized account, statement number) identifying a statement."""
+    number = str(statement.get('number') or '').strip()
+    return normalize_account(statement.get('account', '')), number.lstrip('0') or number
+
+def _day(date_str):
+    """'DD.MM.YYYY' -> 'YYYY-MM-DD' (sortable, for range queries), or None."""
+    day = parse_date(date_str) if date_str else None
+    return day.isoformat() if day else None
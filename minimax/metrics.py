@@ -0,0 +1,115 @@
+"""
+Stage metrics
+=============
+Per-stage instrumentation of the pipeline: wall time, tokens, bytes and row
+counts for PDF extraction, Claude calls, BEX parsing/expansion, the
+debit/credit fix and the exporters.
+
+    with metrics.collect() as records:      # app / CLI: gather one run
+        with metrics.stage('excel', rows=len(transactions)) as m:
+            data = ...
+            m['bytes'] = len(data)
+
+Every finished stage is appended to the active collect() list (if any),
+logged as one JSON line on the "minimax.metrics" logger and, when
+METRICS_LOG is set, appended to that JSON-lines file.
+
+Context (collector, labels such as the file name) lives in contextvars;
+work handed to a thread pool must go through submit() to keep it.
+"""
+
+import contextvars
+import json
+import logging
+import threading
+import time
+from contextlib import contextmanager
+
+from . import config
+
+logger = logging.getLogger(__name__)
+
+_records = contextvars.ContextVar('minimax_metrics_records', default=None)
+_labels = contextvars.ContextVar('minimax_metrics_labels', default={})
+_log_lock = threading.Lock()
+
+@contextmanager
+def collect(records=None):
+    """Collect stage records of everything run inside (appends to `records` if given)."""
+    records = [] if records is None else records
+    token = _records.set(records)
+    try:
+        yield records
+    finally:
+        _records.reset(token)
+
+@contextmanager
+def labels(**values):
+    """Add fields (e.g. file=filename) to every stage record inside."""
+    token = _labels.set({**_labels.get(), **values})
+    try:
+        yield
+    finally:
+        _labels.reset(token)
+
+@contextmanager
+def stage(name, **fields):
+    """
+    Time one stage. Yields the record dict so the body can add measurements
+    (tokens_in, tokens_out, bytes, rows, ...). A failing stage is recorded
+    with its error type and the exception re-raised.
+    """
+    record = {'stage': name, **_labels.get(), **fields}
+    started = time.perf_counter()
+    try:
+        yield record
+    except BaseException as e:
+        record['error'] = type(e).__name__
+        raise
+    finally:
+        record['seconds'] = round(time.perf_counter() - started, 4)
+        _emit(record)
+
+def submit(pool, fn, *args, **kwargs):
+    """pool.submit() that runs fn in a copy of the current context (collector, labels)."""
+    return pool.submit(contextvars.copy_context().run, fn, *args, **kwargs)
+
+def counted(iterable, record, key='rows'):
+    """Pass items through, counting them into record[key] (for generators)."""
+    record[key] = 0
+    for item in iterable:
+        record[key] += 1
+        yield item
+
+def record_usage(record, usage):
+    """Add a Claude response's token usage to a stage record."""
+    if usage is None:
+        return
+    record['tokens_in'] = record.get('tokens_in', 0) + (getattr(usage, 'input_tokens', 0) or 0)
+    record['tokens_out'] = record.get('tokens_out', 0) + (getattr(usage, 'output_tokens', 0) or 0)
+
+def summarize(records):
+    """Totals per stage: {stage: {'count', 'seconds', 'tokens_in', 'tokens_out', 'bytes', 'rows'}}."""
+    summary = {}
+    for record in records:
+        totals = summary.setdefault(record['stage'], {
+            'count': 0, 'seconds': 0.0, 'tokens_in': 0, 'tokens_out': 0, 'bytes': 0, 'rows': 0
+        })
+        totals['count'] += 1
+        for key in ('seconds', 'tokens_in', 'tokens_out', 'bytes', 'rows'):
+            totals[key] += record.get(key) or 0
+    return summary
+
+def _emit(record):
+    """Deliver a finished stage record: collector, logger, JSON-lines file."""
+    record = {'ts': round(time.time(), 3), **record}
+    records = _records.get()
+    if records is not None:
+        records.append(record)
+    
+    line = json.dumps(record, ensure_ascii=False, default=str)
+    logger.info(line)
+    if config.METRICS_LOG:
+        with _log_lock:
+            with open(config.METRICS_LOG, 'a', encoding='utf-8') as f:
+                f.write(line + "\n")
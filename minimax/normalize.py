@@ -0,0 +1,158 @@
+"""
+Text normalization
+==================
+Shrinks extracted PDF text before it is sent to Claude: letterheads, page
+footers and column headers repeated on every page are kept only once,
+whitespace is collapsed and blank lines dropped. Optionally, boilerplate
+sections (notices, legal text) are removed too.
+
+Only blocks at page edges are dropped as repeats. A line within EDGE_LINES
+of the top or bottom of a page goes when it and every line between it and
+that edge repeat on the other pages, compared as written except for page
+numbers. A block stops at the first amount line. Lines with an amount,
+date, account number or payment reference are always kept: two identical
+fee lines on different pages are two transactions.
+"""
+
+import logging
+import math
+import re
+
+from . import config, metrics
+
+logger = logging.getLogger(__name__)
+
+# A page-edge block seen on at least this share of pages (and on 2+ pages)
+# is page furniture - letterhead, footer, column header
+REPEAT_MIN_SHARE = 0.6
+
+# Lines from each end of a page that may be letterhead/footer/column header
+EDGE_LINES = 6
+
+# Rough chars-per-token for Serbian statement text, for before/after reports
+CHARS_PER_TOKEN = 3.5
+
+AMOUNT_RE = re.compile(r'\d{1,3}(?:[.,]\d{3})*[.,]\d{2}\b')
+DATE_RE = re.compile(r'\b\d{1,2}\.\d{1,2}\.(?:\d{4}|\d{2})\b')
+ACCOUNT_RE = re.compile(r'\b\d{3}-?\d{6,13}-?\d{2}\b')
+REFERENCE_RE = re.compile(r'\b\d{2}\s+\d[\d-]{3,}')  # model + poziv na broj, e.g. "97 1234567"
+# "Strana 2 od 3", "2/3", "Page 2" - masked so page footers compare equal
+PAGE_NUMBER_RE = re.compile(r'(?:(?:strana|str\.|page)\s*\d+|^\d+)(?:\s*(?:/|od|of)\s*\d+)?\s*$',
+                            re.IGNORECASE)
+SPACES_RE = re.compile(r'[ \t ]+')
+
+# Paragraphs starting with one of these are not transactions (dropped when
+# drop_sections is on); a section ends at the next blank line or amount line
+NON_TRANSACTION_MARKERS = re.compile(
+    r'^(NAPOMENA|OBAVE[SŠ]TENJE|REKLAMACIJ|PRIGOVOR|VA[ZŽ]NO OBAVE|'
+    r'OVAJ IZVOD JE (IZRA[DĐ]EN|GENERISAN)|IZVOD JE PUNOVA[ZŽ]AN|U SKLADU SA ZAKONOM|'
+    r'PO[SŠ]TOVANI KLIJENT)',
+    re.IGNORECASE
+)
+
+def estimate_tokens(text):
+    """Rough token count of text (no API call)."""
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+def normalize_pages(pages, drop_sections=None):
+    """
+    Normalize page texts for prompting.
+    
+    drop_sections: drop NON_TRANSACTION_MARKERS paragraphs
+                   (default: config.NORMALIZE_DROP_SECTIONS)
+    
+    Returns (pages, stats) - pages in the same order, each ending with a blank
+    line like extract_pages_from_pdf output; stats has chars, estimated
+    tokens and lines before and after.
+    """
+    if drop_sections is None:
+        drop_sections = config.NORMALIZE_DROP_SECTIONS
+    
+    page_lines = [_clean_lines(page, drop_sections) for page in pages]
+    
+    # Page-edge blocks repeated across pages: each edge line is keyed by all
+    # lines from it to the page edge
+    page_edges = [_edge_keys(lines) for lines in page_lines]
+    page_count = {}
+    for edges in page_edges:
+        for key in {key for keys in edges.values() for key in keys}:
+            page_count[key] = page_count.get(key, 0) + 1
+    min_pages = max(2, math.ceil(len(pages) * REPEAT_MIN_SHARE))
+    
+    seen = set()
+    result = []
+    for lines, edges in zip(page_lines, page_edges):
+        kept = []
+        for position, line in enumerate(lines):
+            key, edge_key = edges.get(position, (None, None))
+            # The block must repeat as often as its edge line: a letterhead that
+            # runs into the same first row on two pages stops above that row
+            if (key is not None and page_count[key] >= min_pages
+                    and page_count[key] == page_count[edge_key] and not _protected(line)):
+                if key in seen:
+                    continue
+                seen.add(key)
+            kept.append(line)
+        result.append("\n".join(kept) + "\n\n")
+    
+    before = "".join(pages)
+    after = "".join(result)
+    stats = {
+        'chars_before': len(before),
+        'chars_after': len(after),
+        'tokens_before': estimate_tokens(before),
+        'tokens_after': estimate_tokens(after),
+        'lines_before': before.count("\n"),
+        'lines_after': after.count("\n"),
+    }
+    return result, stats
+
+def normalize_for_prompt(pages, filename):
+    """normalize_pages() when NORMALIZE_TEXT is on (logging the saving), else pages as-is."""
+    if not config.NORMALIZE_TEXT:
+        return pages
+    
+    with metrics.stage('normalize') as m:
+        pages, stats = normalize_pages(pages)
+        m.update(stats)
+    saved = stats['tokens_before'] - stats['tokens_after']
+    logger.info("%s: ~%d -> ~%d tokena (-%d%%)", filename, stats['tokens_before'],
+                stats['tokens_after'], 100 * saved // max(stats['tokens_before'], 1))
+    return pages
+
+def _clean_lines(page, drop_sections):
+    """Collapse whitespace, drop blank lines (and boilerplate paragraphs)."""
+    lines = []
+    dropping = False
+    for raw in page.splitlines():
+        line = SPACES_RE.sub(" ", raw).strip()
+        if not line or AMOUNT_RE.search(line):
+            dropping = False  # never drop anything that may be a transaction
+        elif drop_sections and NON_TRANSACTION_MARKERS.match(line):
+            dropping = True
+        if line and not dropping:
+            lines.append(line)
+    return lines
+
+def _edge_keys(lines):
+    """
+    Position -> (repeat key, key of the edge line) for the lines in a
+    page's top and bottom blocks; a line's key is the line and all lines
+    between it and the edge (page number masked). A block stops before the
+    first (last) amount line and after EDGE_LINES.
+    """
+    keys = {}
+    for edge, positions in (('top', range(len(lines))), ('bottom', range(len(lines) - 1, -1, -1))):
+        block = ()
+        for position in list(positions)[:EDGE_LINES]:
+            line = lines[position]
+            if AMOUNT_RE.search(line):
+                break
+            block += (PAGE_NUMBER_RE.sub("#", line),)
+            keys.setdefault(position, ((edge,) + block, (edge, block[0])))
+    return keys
+
+def _protected(line):
+    """Lines never dropped as repeats: they may belong to a transaction."""
+    return bool(AMOUNT_RE.search(line) or DATE_RE.search(line) or ACCOUNT_RE.search(line)
+                or REFERENCE_RE.search(line))
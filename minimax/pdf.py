@@ -0,0 +1,326 @@
+"""
+PDF text and table extraction
+=============================
+Text extraction for the Claude path, plus a rule-based table parser for
+known bank layouts that needs no AI at all.
+"""
+
+import io
+import math
+import multiprocessing
+import re
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from . import config, metrics
+from .transaction import Transaction, to_cents
+
+# Extraction process pool, shared by every file (and session) of this process
+_extract_pool = None
+_extract_pool_lock = threading.Lock()
+
+def extract_text_from_pdf(pdf_bytes):
+    """Extract text from PDF (supports both regular PDF and ZIP format)."""
+    return "".join(extract_pages_from_pdf(pdf_bytes))
+
+def extract_pages_from_pdf(pdf_bytes):
+    """
+    Extract text per page, each page ending with a blank line.
+    
+    ZIP archives give one "page" per .txt file, anything else one page of raw text.
+    """
+    with metrics.stage('extract', bytes=len(pdf_bytes)) as m:
+        pages = list(iter_pages_from_pdf(pdf_bytes))
+        m['rows'] = len(pages)
+        m['chars'] = sum(len(page) for page in pages)
+    return pages
+
+def iter_pages_from_pdf(pdf_bytes):
+    """
+    Page texts of a PDF (or ZIP of .txt files, or raw text) in page order.
+    
+    With EXTRACT_WORKERS set, PDFs of at least EXTRACT_MIN_PAGES pages are
+    split into page ranges extracted in a process pool (pdfplumber layout
+    analysis is CPU-bound); pages are yielded in order as their range is done.
+    """
+    if not _is_pdf(pdf_bytes):
+        yield from _non_pdf_pages(pdf_bytes)
+        return
+    
+    import pdfplumber
+    try:
+        with pdfplumber.open(io.BytesIO(pdf_bytes)) as pdf:
+            page_count = len(pdf.pages)
+            pool = _get_extract_pool() if page_count >= max(config.EXTRACT_MIN_PAGES, 2) else None
+            if pool is None:
+                for page in pdf.pages:
+                    yield _page_text(page)
+                return
+    except Exception as e:
+        raise ValueError(f"PDF se ne može pročitati: {e}")
+    
+    # Two ranges per worker, so a slow range doesn't leave the others idle
+    per_task = math.ceil(page_count / (config.EXTRACT_WORKERS * 2))
+    done = 0  # pages yielded so far
+    futures = []
+    try:
+        for start in range(0, page_count, per_task):
+            futures.append(pool.submit(_extract_page_range, pdf_bytes, start, min(start + per_task, page_count)))
+        for future in futures:
+            pages = future.result()
+            yield from pages
+            done += len(pages)
+    except BrokenProcessPool:
+        # A worker died (e.g. out of memory) - finish this file here
+        close_extract_pool()
+        yield from _extract_page_range(pdf_bytes, done, page_count)
+    finally:
+        for future in futures:
+            future.cancel()
+
+def _extract_page_range(pdf_bytes, start, stop):
+    """Texts of pages start..stop-1 (run in an extraction worker process)."""
+    import pdfplumber
+    try:
+        with pdfplumber.open(io.BytesIO(pdf_bytes)) as pdf:
+            return [_page_text(page) for page in pdf.pages[start:stop]]
+    except Exception as e:
+        raise ValueError(f"PDF se ne može pročitati: {e}")
+
+def _page_text(page):
+    # extract_text() returns None for a page without text (e.g. a scan)
+    return (page.extract_text() or '') + "\n\n"
+
+def _is_pdf(data):
+    """%PDF header - readers accept it anywhere in the first 1024 bytes."""
+    return b"%PDF" in data[:1024]
+
+def _non_pdf_pages(data):
+    """ZIP archives give one "page" per .txt file, anything else one page of raw text."""
+    if data[:2] == b"PK":
+        import zipfile
+        with zipfile.ZipFile(io.BytesIO(data)) as z:
+            for name in sorted(n for n in z.namelist() if n.endswith('.txt')):
+                yield z.read(name).decode('utf-8', errors='replace') + "\n\n"
+        return
+    yield data.decode('utf-8', errors='replace')
+
+def _get_extract_pool():
+    """
+    The shared extraction pool (created on first use), or None when
+    EXTRACT_WORKERS is 0.
+    """
+    global _extract_pool
+    if config.EXTRACT_WORKERS < 1:
+        return None
+    with _extract_pool_lock:
+        if _extract_pool is None:
+            # spawn, not fork: the app process is multi-threaded
+            _extract_pool = ProcessPoolExecutor(max_workers=config.EXTRACT_WORKERS,
+                                                mp_context=multiprocessing.get_context('spawn'))
+        return _extract_pool
+
+def close_extract_pool(wait=False):
+    """
+    Shut the extraction pool down; the next extraction starts a new one.
+    Needed only where interpreter exit doesn't do it (inside a
+    multiprocessing worker) or to drop a broken pool. wait=True blocks
+    until the worker processes have exited - required before the calling
+    process itself exits as a multiprocessing worker, which otherwise
+    hangs on the pool's still-running management thread.
+    """
+    global _extract_pool
+    with _extract_pool_lock:
+        if _extract_pool is not None:
+            _extract_pool.shutdown(wait=wait, cancel_futures=True)
+            _extract_pool = None
+
+# ========================================================================
+# RULE-BASED PDF PARSING (known bank layouts - no AI, milliseconds per file)
+# ========================================================================
+
+# Header aliases shared by Serbian bank statement tables (matched upper-case,
+# as substring of the header cell). Layouts below can override any of them.
+DEFAULT_COLUMN_ALIASES = {
+    'date': ['DATUM VALUTE', 'DATUM', 'VALUTA'],
+    'customer_name': ['NALOGODAVAC', 'PRIMALAC', 'PLATILAC', 'KOMITENT', 'KORISNIK', 'NAZIV'],
+    'customer_account': ['BROJ RAČUNA', 'BROJ RACUNA', 'RAČUN', 'RACUN', 'PARTIJA'],
+    'reference': ['POZIV NA BROJ', 'REFERENCA', 'POZIV'],
+    'description': ['SVRHA', 'OPIS'],
+    'debit': ['DUGUJE', 'ZADUŽENJE', 'ZADUZENJE', 'NA TERET', 'ISPLATA'],
+    'credit': ['POTRAŽUJE', 'POTRAZUJE', 'ODOBRENJE', 'U KORIST', 'UPLATA'],
+}
+
+# Known layouts, detected by markers in the first page text
+BANK_LAYOUTS = [
+    {'name': 'Raiffeisen', 'markers': ['RAIFFEISEN BANKA']},
+    {'name': 'Banca Intesa', 'markers': ['BANCA INTESA']},
+    {'name': 'UniCredit', 'markers': ['UNICREDIT BANK']},
+    {'name': 'NLB Komercijalna', 'markers': ['NLB KOMERCIJALNA', 'KOMERCIJALNA BANKA']},
+    {'name': 'AIK', 'markers': ['AIK BANKA']},
+    {'name': 'OTP', 'markers': ['OTP BANKA']},
+    {'name': 'Erste', 'markers': ['ERSTE BANK']},
+    {'name': 'Poštanska štedionica', 'markers': ['POŠTANSKA ŠTEDIONICA', 'POSTANSKA STEDIONICA']},
+]
+
+# Statement totals printed by the bank - used to reconcile the extracted rows
+DEBIT_TOTAL_RE = re.compile(
+    r'(?:DUGOVNI PROMET|UKUPNO DUGUJE|UKUPNO ZADU[ŽZ]ENJE|PROMET NA TERET)\D{0,20}(\d[\d.,]*)')
+CREDIT_TOTAL_RE = re.compile(
+    r'(?:POTRA[ŽZ]NI PROMET|UKUPNO POTRA[ŽZ]UJE|UKUPNO ODOBRENJE|PROMET U KORIST)\D{0,20}(\d[\d.,]*)')
+
+ACCOUNT_RE = re.compile(r'\b(\d{3})-?(\d{13})-?(\d{2})\b')
+DATE_RE = re.compile(r'\b(\d{2}\.\d{2}\.\d{4})\b')
+STATEMENT_NUMBER_RE = re.compile(r'IZVOD\s*(?:BROJ|BR\.?)?\s*[:.]?\s*(\d+)')
+STATEMENT_DATE_RE = re.compile(r'DATUM(?: IZVODA)?\s*[:.]?\s*(\d{2}\.\d{2}\.\d{4})')
+OWNER_NAME_RE = re.compile(r'(?:KOMITENT|KLIJENT|VLASNIK RAČUNA|VLASNIK RACUNA)\s*:\s*(.+)')
+TAX_NUMBER_RE = re.compile(r'PIB\s*[:.]?\s*(\d{9})')
+
+def detect_bank_layout(first_page_text):
+    """Return the known layout whose markers appear in the text, or None."""
+    upper = first_page_text.upper()
+    for layout in BANK_LAYOUTS:
+        if any(marker in upper for marker in layout['markers']):
+            return layout
+    return None
+
+def parse_amount(value):
+    """Parse bank amount: '1.234,56', '1,234.56', '1234,56' or '' -> float."""
+    s = re.sub(r'[^\d,.\-]', '', str(value or ''))
+    if not s or s == '-':
+        return 0.0
+    
+    # The right-most separator followed by 1-2 digits is the decimal one
+    last = max(s.rfind(','), s.rfind('.'))
+    if last != -1 and len(s) - last - 1 in (1, 2):
+        whole = s[:last].replace(',', '').replace('.', '')
+        return float(f"{whole}.{s[last + 1:]}")
+    return float(s.replace(',', '').replace('.', ''))
+
+def _map_header(row, aliases):
+    """Map field name -> column index for a header row, or None if not a header."""
+    cells = [(cell or '').replace('\n', ' ').upper() for cell in row]
+    mapping = {}
+    for field, names in aliases.items():
+        for i, cell in enumerate(cells):
+            if i in mapping.values():
+                continue
+            if any(name in cell for name in names):
+                mapping[field] = i
+                break
+    
+    if 'debit' in mapping and 'credit' in mapping and 'date' in mapping:
+        return mapping
+    return None
+
+def _row_to_transaction(row, mapping):
+    """Convert a table row to a Transaction, or None for non-data rows."""
+    def cell(field):
+        i = mapping.get(field)
+        if i is None or i >= len(row):
+            return ''
+        return ' '.join((row[i] or '').split())
+    
+    date_match = DATE_RE.search(cell('date'))
+    if not date_match:
+        return None
+    
+    debit = to_cents(parse_amount(cell('debit')))
+    credit = to_cents(parse_amount(cell('credit')))
+    if not debit and not credit:
+        return None
+    
+    return Transaction(
+        date=date_match.group(1),
+        customer_name=cell('customer_name'),
+        customer_account=re.sub(r'\D', '', cell('customer_account')),
+        reference=cell('reference'),
+        debit=debit,
+        credit=credit,
+        description=cell('description')
+    )
+
+def _parse_statement_header(text):
+    """Pull statement header fields out of the page text with regexes."""
+    upper = text.upper()
+    
+    def first(regex, source=upper):
+        match = regex.search(source)
+        return match.group(1).strip() if match else ''
+    
+    account = ACCOUNT_RE.search(text)
+    return {
+        'date': first(STATEMENT_DATE_RE) or first(DATE_RE),
+        'account': ''.join(account.groups()) if account else '',
+        'number': first(STATEMENT_NUMBER_RE),
+        'owner_name': first(OWNER_NAME_RE),
+        'owner_address': '',
+        'tax_number': first(TAX_NUMBER_RE)
+    }
+
+def parse_pdf_tables(pdf_bytes):
+    """
+    Parse a PDF izvod from its tables, without AI.
+    
+    Returns the same {'statement', 'transactions'} dict as parse_xml_izvod, or
+    None when the bank layout is unknown, the header is incomplete or the
+    extracted rows don't reconcile with the printed totals - the caller then
+    falls back to Claude.
+    """
+    if not _is_pdf(pdf_bytes):
+        return None
+    try:
+        import pdfplumber
+        with pdfplumber.open(io.BytesIO(pdf_bytes)) as pdf:
+            if not pdf.pages:
+                return None
+            
+            # The layout is known from page one - unknown ones (the Claude
+            # path) don't pay for extracting the rest here
+            first_text = pdf.pages[0].extract_text() or ''
+            layout = detect_bank_layout(first_text)
+            if layout is None:
+                return None
+            texts = [first_text] + [page.extract_text() or '' for page in pdf.pages[1:]]
+            
+            aliases = {**DEFAULT_COLUMN_ALIASES, **layout.get('columns', {})}
+            transactions = []
+            mapping = None
+            
+            for page in pdf.pages:
+                for table in page.extract_tables():
+                    for row in table:
+                        # Header rows repeat on every page - re-map and skip them
+                        header = _map_header(row, aliases)
+                        if header:
+                            mapping = header
+                            continue
+                        if mapping:
+                            tx = _row_to_transaction(row, mapping)
+                            if tx:
+                                transactions.append(tx)
+        
+        full_text = "\n".join(texts)
+        statement = _parse_statement_header(full_text)
+        if not statement['account'] or not statement['number'] or not statement['date']:
+            return None
+        
+        # Reconcile against the totals printed on the statement
+        upper = full_text.upper()
+        debit_total = DEBIT_TOTAL_RE.search(upper)
+        credit_total = CREDIT_TOTAL_RE.search(upper)
+        if not debit_total or not credit_total:
+            return None
+        if sum(tx.debit for tx in transactions) != to_cents(parse_amount(debit_total.group(1))):
+            return None
+        if sum(tx.credit for tx in transactions) != to_cents(parse_amount(credit_total.group(1))):
+            return None
+    except Exception:
+        # Anything unexpected in the layout - Claude reads the file instead
+        return None
+    
+    return {
+        'statement': statement,
+        'transactions': transactions
+    }
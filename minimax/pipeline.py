@@ -0,0 +1,497 @@
+"""
+Conversion pipeline
+===================
+izvod file -> parsed statement -> BEX expansion -> debit/credit fix -> export.
+UI-free: used by the Streamlit app and the batch CLI alike.
+"""
+
+import queue
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, ProcessPoolExecutor, wait
+from functools import partial
+from pathlib import Path
+
+from . import config, ledger, metrics
+from .batch import run_message_batch
+from .bex import (
+    bex_customers_from_json,
+    build_spec_index,
+    expand_bex_transactions,
+    matches_unused_spec,
+    parse_bex_specification,
+)
+from .cache import cache_key, cache_get, cache_put
+from .claude import (
+    BEX_PROMPT_VERSION,
+    IZVOD_PROMPT_VERSION,
+    TruncatedResponse,
+    bex_request,
+    izvod_request,
+    merge_parsed_chunks,
+    parse_bex_message,
+    parse_izvod_message,
+    parse_izvod_text,
+    parse_truncated,
+    parse_with_claude_chunked,
+    split_pages,
+)
+from .classify import fix_debit_credit_logic
+from .export import create_minimax_excel, create_minimax_xml
+from .normalize import normalize_for_prompt
+from .pdf import extract_pages_from_pdf, parse_pdf_tables
+from .transaction import as_transactions
+from .xml_izvod import parse_xml_izvod
+
+# Output format -> (file suffix, MIME type)
+OUTPUT_FORMATS = {
+    'Excel': ('_minimax.xlsx', "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"),
+    'XML': ('_minimax.xml', "application/xml"),
+}
+
+# How often streamed rows are handed from the workers to on_transaction
+ROW_POLL_SECONDS = 0.1
+
+def parse_izvod(file_bytes, filename, use_cache=True, chunked=True, on_transaction=None):
+    """
+    Parse a single izvod - XML directly, PDF from its tables when the bank
+    layout is known, otherwise via text extraction + Claude.
+    
+    Claude results are cached by file content, so re-running a batch only
+    calls the API for files that were not parsed before. With chunked=True
+    long PDFs are split into page groups parsed in parallel. With an
+    on_transaction(tx) callback Claude responses are streamed and every row
+    is reported as soon as it arrives (tx None: drop the rows reported so
+    far, a response was cut off and is parsed again).
+    
+    Transactions are returned as Transaction records, whatever the source
+    (Claude's JSON and the cache hold plain dicts).
+    """
+    with metrics.labels(file=filename), metrics.stage('parse', bytes=len(file_bytes)) as m:
+        parsed = _parse_izvod(file_bytes, filename, use_cache, chunked, on_transaction)
+        parsed['transactions'] = as_transactions(parsed.get('transactions') or [])
+        m['rows'] = len(parsed['transactions'])
+    return parsed
+
+def _parse_izvod(file_bytes, filename, use_cache, chunked, on_transaction):
+    parsed = parse_izvod_locally(file_bytes, filename, use_cache)
+    if parsed is not None:
+        return parsed
+    
+    key = cache_key(file_bytes, IZVOD_PROMPT_VERSION)
+    pages = normalize_for_prompt(extract_pages_from_pdf(file_bytes), filename)
+    if chunked:
+        parsed = parse_with_claude_chunked(pages, filename, on_transaction=on_transaction)
+    else:
+        parsed = parse_izvod_text("".join(pages), filename, on_transaction=on_transaction)
+    cache_put(key, parsed)
+    return parsed
+
+def parse_izvod_locally(file_bytes, filename, use_cache=True):
+    """
+    Parse an izvod without calling Claude: XML, PDF tables of a known bank
+    layout, or a cached Claude result. None when Claude is needed.
+    """
+    if filename.lower().endswith('.xml'):
+        return parse_xml_izvod(file_bytes, filename)
+    
+    parsed = parse_pdf_tables(file_bytes)
+    if parsed is not None:
+        return parsed
+    
+    if use_cache:
+        return cache_get(cache_key(file_bytes, IZVOD_PROMPT_VERSION))
+    return None
+
+def parse_izvodi_parallel(uploads, max_workers=None, on_done=None, use_cache=True,
+                          chunked=True, processes=False, on_transaction=None):
+    """
+    Parse many izvodi concurrently with a bounded worker pool.
+    
+    uploads: list of (filename, file_bytes)
+    on_done: optional callback(index, error) called as each file finishes
+    use_cache: reuse cached Claude results (False forces a fresh parse)
+    chunked: split long PDFs into page chunks (see parse_with_claude_chunked)
+    processes: use a process pool instead of threads (CPU-bound local parsing)
+    on_transaction: optional callback(index, tx) for rows streamed from Claude
+                    while files are still parsing (threads only); tx None
+                    voids the file's rows so far
+    
+    Returns a list of (parsed, error) tuples in upload order. A failure in
+    one file never affects the others.
+    """
+    outcomes = [None] * len(uploads)
+    max_workers = max(1, max_workers or config.MAX_WORKERS)
+    
+    if processes:
+        # Workers start from env defaults - hand them the current settings
+        # (without an extraction pool each: they already are the parallelism)
+        pool = ProcessPoolExecutor(max_workers=max_workers, initializer=config.load,
+                                   initargs=({**config.snapshot(), 'EXTRACT_WORKERS': 0},))
+        on_transaction = None
+    else:
+        pool = ThreadPoolExecutor(max_workers=max_workers)
+    
+    # Streamed rows are queued by the workers and handed to on_transaction
+    # here, so callbacks (e.g. Streamlit calls) stay in the calling thread
+    rows = queue.Queue() if on_transaction else None
+    
+    def report_rows():
+        while rows is not None:
+            try:
+                i, tx = rows.get_nowait()
+            except queue.Empty:
+                return
+            on_transaction(i, tx)
+    
+    with pool:
+        # Threads run in a copy of this context so their stage metrics land
+        # in the caller's collector (processes only write the metrics log)
+        submit = pool.submit if processes else partial(metrics.submit, pool)
+        futures = {
+            submit(parse_izvod, file_bytes, filename, use_cache, chunked,
+                   (lambda tx, i=i: rows.put((i, tx))) if rows else None): i
+            for i, (filename, file_bytes) in enumerate(uploads)
+        }
+        
+        # Callbacks run here, in the calling thread (e.g. the Streamlit script)
+        pending = set(futures)
+        while pending:
+            done, pending = wait(pending, timeout=ROW_POLL_SECONDS if rows else None,
+                                 return_when=FIRST_COMPLETED)
+            report_rows()
+            for future in done:
+                i = futures[future]
+                try:
+                    outcomes[i] = (future.result(), None)
+                except Exception as e:
+                    outcomes[i] = (None, e)
+                
+                if on_done:
+                    on_done(i, outcomes[i][1])
+    
+    return outcomes
+
+def parse_uploads_batched(uploads, spec_uploads=(), use_cache=True, chunked=True,
+                          on_progress=None, client=None):
+    """
+    Parse izvodi and BEX specifications with one Message Batch.
+    
+    Everything that can be parsed locally (XML, known PDF layouts, CSV specs,
+    cached results) is; all remaining Claude prompts - every chunk of every
+    izvod and every PDF specification - go out as a single batch. Results are
+    cached like synchronous ones.
+    
+    uploads, spec_uploads: lists of (filename, file_bytes)
+    on_progress: optional callback(done, total) while the batch runs
+    client: optional client for the batch (default: the shared one)
+    
+    Returns (izvod_outcomes, spec_outcomes), lists of (result, error) tuples
+    in upload order - parsed izvod dicts and BEX customer lists respectively.
+    """
+    izvod_outcomes = [None] * len(uploads)
+    spec_outcomes = [None] * len(spec_uploads)
+    requests = {}
+    izvod_chunks = {}  # izvod index -> its chunk texts, one request each
+    
+    for i, (filename, file_bytes) in enumerate(uploads):
+        try:
+            with metrics.labels(file=filename):
+                parsed = parse_izvod_locally(file_bytes, filename, use_cache)
+                if parsed is not None:
+                    parsed['transactions'] = as_transactions(parsed.get('transactions') or [])
+                    izvod_outcomes[i] = (parsed, None)
+                    continue
+                pages = normalize_for_prompt(extract_pages_from_pdf(file_bytes), filename)
+            
+            chunks = split_pages(pages) if chunked else ["".join(pages)]
+            for j, chunk in enumerate(chunks):
+                requests[f"izvod-{i}-{j}"] = izvod_request(chunk, filename, _part(j, len(chunks)))
+            izvod_chunks[i] = chunks
+        except Exception as e:
+            izvod_outcomes[i] = (None, e)
+    
+    for i, (filename, file_bytes) in enumerate(spec_uploads):
+        try:
+            if filename.lower().endswith('.csv'):
+                spec_outcomes[i] = (parse_bex_specification(file_bytes, filename, use_cache), None)
+                continue
+            
+            data = cache_get(cache_key(file_bytes, BEX_PROMPT_VERSION)) if use_cache else None
+            if data is not None:
+                spec_outcomes[i] = (bex_customers_from_json(data), None)
+                continue
+            
+            with metrics.labels(file=filename):
+                pages = normalize_for_prompt(extract_pages_from_pdf(file_bytes), filename)
+            requests[f"spec-{i}"] = bex_request("".join(pages))
+        except Exception as e:
+            spec_outcomes[i] = (None, e)
+    
+    try:
+        results = run_message_batch(requests, client=client, on_progress=on_progress)
+    except Exception as e:
+        # Batch could not run at all - fail only the files that needed it
+        results = {custom_id: (None, e) for custom_id in requests}
+    
+    for i, chunks in izvod_chunks.items():
+        filename, file_bytes = uploads[i]
+        try:
+            parts = []
+            for j, chunk in enumerate(chunks):
+                msg, error = results[f"izvod-{i}-{j}"]
+                if error is not None:
+                    raise error
+                try:
+                    parts.append(parse_izvod_message(msg))
+                except TruncatedResponse:
+                    # Too many rows for one response - this chunk again, in halves
+                    with metrics.labels(file=filename):
+                        parts.append(parse_truncated(chunk, filename, _part(j, len(chunks))))
+            parsed = parts[0] if len(chunks) == 1 else merge_parsed_chunks(parts)
+            cache_put(cache_key(file_bytes, IZVOD_PROMPT_VERSION), parsed)
+            parsed['transactions'] = as_transactions(parsed.get('transactions') or [])
+            izvod_outcomes[i] = (parsed, None)
+        except Exception as e:
+            izvod_outcomes[i] = (None, e)
+    
+    for i, (filename, file_bytes) in enumerate(spec_uploads):
+        if spec_outcomes[i] is not None:
+            continue
+        try:
+            msg, error = results[f"spec-{i}"]
+            if error is not None:
+                raise error
+            data = parse_bex_message(msg)
+            cache_put(cache_key(file_bytes, BEX_PROMPT_VERSION), data)
+            spec_outcomes[i] = (bex_customers_from_json(data), None)
+        except Exception as e:
+            spec_outcomes[i] = (None, ValueError(f"PDF parsing greška: {str(e)}"))
+    
+    return izvod_outcomes, spec_outcomes
+
+def _part(index, count):
+    """Chunk position for izvod_request(), None for a whole izvod."""
+    return (index, count) if count > 1 else None
+
+def process_izvod(parsed, specifications, spec_index=None, on_bex_match=None):
+    """
+    Expand BEX payouts and fix debit/credit for one parsed izvod.
+    
+    Returns (transactions, bex_expanded).
+    """
+    original_count = len(parsed['transactions'])
+    expanded = expand_bex_transactions(parsed['transactions'], specifications, spec_index,
+                                       on_match=on_bex_match)
+    expanded = fix_debit_credit_logic(expanded, parsed['statement'].get('account', ''))
+    return expanded, len(expanded) > original_count
+
+def convert_izvod(filename, parsed, specifications, spec_index=None, on_bex_match=None,
+                  file_bytes=None, use_ledger=True):
+    """
+    Normalized result for one izvod - final statement and transactions, from
+    which every output format is rendered. No file is generated here; call
+    izvod_output() for the format actually requested.
+    
+    file_bytes: the izvod file. When given, the result is saved to the ledger,
+    and with use_ledger a statement already there (same account and number,
+    e.g. uploaded before as another file) is loaded from it instead - unless
+    one of its BEX payouts now has a spec.
+    """
+    if file_bytes is not None and use_ledger:
+        known = ledger.find_statement(parsed['statement'], file_bytes, filename)
+        if known is not None:
+            if not (spec_index and matches_unused_spec(known['transactions'], spec_index)):
+                return known
+            # Converted again: the specs it consumed are free for it again
+            spec_index['used'].difference_update(known['bex_specs'])
+    
+    bex_specs = []  # specs consumed by this izvod's BEX payouts
+    
+    def on_match(spec_names, customer_count):
+        bex_specs.extend(spec_names)
+        if on_bex_match:
+            on_bex_match(spec_names, customer_count)
+    
+    with metrics.labels(file=filename):
+        transactions, bex_expanded = process_izvod(parsed, specifications, spec_index, on_match)
+    converted = {
+        'filename': filename,
+        'statement': parsed['statement'],
+        'transactions': transactions,
+        'bex_expanded': bex_expanded,
+        'bex_specs': bex_specs,
+        'outputs': {},  # output format -> file bytes, filled by izvod_output()
+    }
+    if file_bytes is not None:
+        ledger.save(converted, file_bytes, specifications)
+    return converted
+
+def find_processed(uploads):
+    """
+    Izvodi among uploads that were converted before (same file), loaded from
+    the ledger: dict upload index -> convert_izvod() result.
+    """
+    known = {}
+    for i, (filename, file_bytes) in enumerate(uploads):
+        converted = ledger.find_file(file_bytes, filename)
+        if converted is not None:
+            known[i] = converted
+    return known
+
+def convert_uploads(all_uploads, spec_uploads=(), max_workers=None, use_cache=True, chunked=True,
+                    use_ledger=True, batch=False, processes=False, on_message=None, on_progress=None,
+                    on_file=None, on_transaction=None, on_result=None):
+    """
+    Convert a whole set of uploads - what one "Generiši" in the app does.
+    Izvodi processed before load from the ledger (with use_ledger) unless one
+    of their BEX payouts now has a spec; the rest are parsed in parallel (or
+    with batch=True as one Message Batch together with the PDF
+    specifications), then BEX expansion and the debit/credit fix run in
+    upload order, so a spec is used for at most one payout.
+    
+    all_uploads, spec_uploads: lists of (filename, file_bytes)
+    processes: parse in a process pool (see parse_izvodi_parallel)
+    on_message(kind, text): notes for the user, kind 'info', 'success' or 'error'
+    on_progress(done, total, text): parsing progress
+    on_file(index, status): per izvod (index into all_uploads) - 'parsing',
+                            'done', 'error' or the rows streamed so far
+    on_transaction(index, tx): rows streamed from Claude (not in batch mode);
+                               tx None voids the izvod's rows so far
+    on_result(result): each result as it is ready, in upload order
+    
+    Returns the results in upload order: convert_izvod() dicts with
+    'success': True, or {'success': False, 'filename', 'error'}.
+    """
+    def message(kind, text):
+        if on_message:
+            on_message(kind, text)
+    
+    def progress(done, total, text):
+        if on_progress:
+            on_progress(done, total, text)
+    
+    def file_status(index, status):
+        if on_file:
+            on_file(index, status)
+    
+    known = find_processed(all_uploads) if use_ledger else {}
+    new_indexes = [i for i in range(len(all_uploads)) if i not in known]
+    uploads = [all_uploads[i] for i in new_indexes]
+    if known:
+        message('info', f"📚 {len(known)} izvoda je već obrađeno - učitavam ih iz baze")
+    for i in known:
+        file_status(i, 'done')
+    for i in new_indexes:
+        file_status(i, 'parsing')
+    progress(0, len(uploads), "Parsiram izvode...")
+    
+    if batch:
+        outcomes, spec_outcomes = parse_uploads_batched(
+            uploads, spec_uploads, use_cache=use_cache, chunked=chunked,
+            on_progress=lambda done, total: progress(done, total, f"Batch: obrađeno {done}/{total} AI zahteva")
+        )
+    else:
+        spec_outcomes = []
+        for name, spec_bytes in spec_uploads:
+            try:
+                spec_outcomes.append((parse_bex_specification(spec_bytes, name, use_cache), None))
+            except Exception as e:
+                spec_outcomes.append((None, e))
+        
+        parsed_count = [0]
+        streamed = [0] * len(uploads)
+        
+        def on_parsed(i, error):
+            parsed_count[0] += 1
+            file_status(new_indexes[i], 'done' if error is None else 'error')
+            progress(parsed_count[0], len(uploads), f"Parsirano {parsed_count[0]}/{len(uploads)}")
+        
+        def on_row(i, tx):
+            streamed[i] = 0 if tx is None else streamed[i] + 1
+            file_status(new_indexes[i], streamed[i] or 'parsing')
+            on_transaction(new_indexes[i], tx)
+        
+        outcomes = parse_izvodi_parallel(uploads, max_workers, on_done=on_parsed, use_cache=use_cache,
+                                         chunked=chunked, processes=processes,
+                                         on_transaction=on_row if on_transaction else None)
+    
+    specifications = {}
+    for (name, _), (customers, error) in zip(spec_uploads, spec_outcomes):
+        if error is not None:
+            message('error', f"❌ {name}: {error}")
+        elif customers:
+            specifications[name] = customers
+            total = sum(c['amount'] for c in customers)
+            message('success', f"✅ {name}: {len(customers)} kupaca, {total:,.2f} RSD")
+    
+    spec_index = build_spec_index(specifications)
+    if use_ledger:
+        # Specs already consumed by earlier statements stay used
+        ledger.mark_used_specs(spec_index)
+    
+    # A known izvod with a BEX payout that one of these specs matches was
+    # converted without it - convert it again (its parse usually comes from the cache)
+    stale = [i for i in known if matches_unused_spec(known[i]['transactions'], spec_index)]
+    for i in stale:
+        spec_index['used'].difference_update(known.pop(i)['bex_specs'])
+    outcomes = dict(zip(new_indexes, outcomes))
+    if stale:
+        message('info', f"🔄 {len(stale)} izvoda iz baze ima novu BEX specifikaciju - obrađujem ih ponovo")
+        outcomes.update(zip(stale, parse_izvodi_parallel([all_uploads[i] for i in stale], max_workers,
+                                                         use_cache=use_cache, chunked=chunked,
+                                                         processes=processes)))
+    
+    results = []
+    for i, (filename, file_bytes) in enumerate(all_uploads):
+        if i in known:
+            result = known[i]
+            result['success'] = True
+        else:
+            parsed, error = outcomes[i]
+            if error is not None:
+                result = {'success': False, 'filename': filename, 'error': str(error)}
+            else:
+                try:
+                    result = convert_izvod(
+                        filename, parsed, specifications, spec_index,
+                        on_bex_match=lambda names, count: message(
+                            'success', f"🔄 {filename}: razbijam BEX - {count} kupaca"
+                            + (f" iz {len(names)} specifikacija" if len(names) > 1 else "")
+                        ),
+                        file_bytes=file_bytes, use_ledger=use_ledger
+                    )
+                    result['success'] = True
+                except Exception as e:
+                    result = {'success': False, 'filename': filename, 'error': str(e)}
+        results.append(result)
+        if on_result:
+            on_result(result)
+    
+    return results
+
+def izvod_output(converted, output_format):
+    """
+    File bytes for a converted izvod, built on first request and kept in
+    converted['outputs'] - in memory, or on disk for izvodi kept in the
+    output store (store.keep()).
+    """
+    outputs = converted['outputs']
+    try:
+        return outputs[output_format]
+    except KeyError:
+        pass  # not built yet, or trimmed from the store
+    
+    with metrics.labels(file=converted['filename']):
+        data = render_output(converted['statement'], converted['transactions'], output_format)
+    outputs[output_format] = data
+    return data
+
+def render_output(statement, transactions, output_format):
+    """Build the Minimax file bytes for 'Excel' or 'XML'."""
+    if output_format == 'Excel':
+        return create_minimax_excel(statement, transactions)
+    return create_minimax_xml(statement, transactions)
+
+def output_filename(filename, output_format):
+    """Name of the generated file for an izvod ('izvod.pdf' or 'izvod.xml' -> 'izvod_minimax.xlsx')."""
+    suffix, _ = OUTPUT_FORMATS[output_format]
+    return Path(filename).stem + suffix
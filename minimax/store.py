@@ -0,0 +1,252 @@
+"""
+Output store
+============
+File-backed store for what a Streamlit session keeps between reruns: the
+generated Minimax files, and - once the session goes over its memory cap -
+the transaction lists of converted izvodi. The app process then holds only
+small summaries, and downloads read their file from disk when clicked.
+
+    store.keep(converted, session_id)        # outputs now go to disk
+    usage = store.enforce_memory_cap(results) # spill oldest transaction lists
+
+Files live under OUTPUT_DIR, one directory per session. A session not seen
+for OUTPUT_TTL_MINUTES is deleted, and the whole store is trimmed least
+recently used first to OUTPUT_MAX_MB. A trimmed output is simply rendered
+again; a trimmed transaction list is reported as expired.
+"""
+
+import os
+import pickle
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from collections.abc import MutableMapping
+from pathlib import Path
+
+from . import config, metrics
+from .transaction import FIELDS, Transaction
+
+# Cleanup runs at most this often per process (it walks the whole store)
+CLEANUP_INTERVAL_SECONDS = 60
+
+_cleanup_lock = threading.Lock()
+_last_cleanup = [0.0]
+
+class StoredOutputs(MutableMapping):
+    """
+    converted['outputs'] of a kept izvod: output format -> file bytes, each
+    value a file in the store, read on access. A file trimmed from the store
+    is simply missing, so izvod_output() renders it again.
+    """
+    
+    def __init__(self, directory, name):
+        self._directory = directory
+        self._name = name
+        self._formats = set()  # formats written; a trimmed file drops out of the mapping
+    
+    def _path(self, output_format):
+        return self._directory / f"{self._name}.{output_format.lower()}"
+    
+    def __getitem__(self, output_format):
+        path = self._path(output_format)
+        try:
+            data = path.read_bytes()
+            os.utime(path)  # mtime is the LRU clock
+        except OSError:
+            raise KeyError(output_format)
+        return data
+    
+    def __setitem__(self, output_format, data):
+        _write_atomic(self._path(output_format), data)
+        self._formats.add(output_format)
+        cleanup()
+    
+    def __delitem__(self, output_format):
+        self._formats.discard(output_format)
+        try:
+            self._path(output_format).unlink()
+        except OSError:
+            raise KeyError(output_format)
+    
+    def __contains__(self, output_format):
+        return output_format in self._formats and self._path(output_format).exists()
+    
+    def __iter__(self):
+        return (f for f in list(self._formats) if self._path(f).exists())
+    
+    def __len__(self):
+        return sum(1 for _ in self)
+
+class SpilledTransactions:
+    """
+    Transaction list moved to the store: len() without touching the disk,
+    iteration reads the records back from the file.
+    """
+    __slots__ = ('path', 'count', 'filename')
+    
+    def __init__(self, path, count, filename):
+        self.path = path
+        self.count = count
+        self.filename = filename
+    
+    def __len__(self):
+        return self.count
+    
+    def __iter__(self):
+        try:
+            with open(self.path, 'rb') as f:
+                rows = pickle.load(f)
+            os.utime(self.path)
+        except (OSError, pickle.UnpicklingError, EOFError):
+            raise ValueError(f"{self.filename}: sačuvane transakcije su istekle - pokreni obradu ponovo")
+        return (Transaction(*row) for row in rows)
+
+def new_session():
+    """Id of a new session's directory in the store."""
+    return uuid.uuid4().hex
+
+def touch(session_id):
+    """Mark a session as alive (resets its TTL) and run the periodic cleanup."""
+    directory = _session_dir(session_id)
+    try:
+        directory.mkdir(parents=True, exist_ok=True)
+        os.utime(directory)
+    except OSError:
+        pass
+    cleanup()
+
+def keep(converted, session_id):
+    """
+    Move a converted izvod into the session's store: its generated files are
+    written to disk from now on, and its in-memory size is measured for
+    enforce_memory_cap().
+    """
+    directory = _session_dir(session_id)
+    directory.mkdir(parents=True, exist_ok=True)
+    name = uuid.uuid4().hex[:16]
+    outputs = StoredOutputs(directory, name)
+    for output_format, data in converted['outputs'].items():
+        outputs[output_format] = data
+    converted['outputs'] = outputs
+    converted['store_path'] = str(directory / name)
+    converted['memory_bytes'] = _transactions_size(converted['transactions'])
+
+def spill(converted):
+    """Write a kept izvod's transactions to the store and drop them (and its preview) from memory."""
+    transactions = converted['transactions']
+    if not isinstance(transactions, SpilledTransactions):
+        path = Path(converted['store_path'] + '.tx')
+        with metrics.stage('spill', file=converted['filename'], rows=len(transactions)) as m:
+            rows = [tuple(getattr(tx, name) for name in FIELDS) for tx in transactions]
+            _write_atomic(path, pickle.dumps(rows, protocol=pickle.HIGHEST_PROTOCOL))
+            m['bytes'] = path.stat().st_size
+        converted['transactions'] = SpilledTransactions(path, len(rows), converted['filename'])
+    converted.pop('preview', None)
+    converted['memory_bytes'] = 0
+
+def enforce_memory_cap(results, max_mb=None):
+    """
+    Keep the in-memory transaction lists and previews of a session's kept
+    izvodi (results: oldest first) under max_mb (default SESSION_MEMORY_MB)
+    by spilling the oldest ones to disk. Returns the usage after:
+    {'memory_bytes', 'cap_bytes', 'spilled', 'disk_bytes'}.
+    """
+    cap_bytes = (config.SESSION_MEMORY_MB if max_mb is None else max_mb) * 1024 * 1024
+    kept = [r for r in results if 'store_path' in r]
+    total = sum(r['memory_bytes'] for r in kept)
+    for r in kept:
+        if total <= cap_bytes:
+            break
+        if r['memory_bytes']:
+            total -= r['memory_bytes']
+            spill(r)
+    
+    disk_bytes = 0
+    for r in kept:
+        for path in Path(r['store_path']).parent.glob(Path(r['store_path']).name + '.*'):
+            try:
+                disk_bytes += path.stat().st_size
+            except OSError:
+                pass
+    return {
+        'memory_bytes': total,
+        'cap_bytes': cap_bytes,
+        'spilled': sum(1 for r in kept if isinstance(r['transactions'], SpilledTransactions)),
+        'disk_bytes': disk_bytes,
+    }
+
+def discard(results):
+    """Delete the store files of kept izvodi (e.g. of a run no longer kept)."""
+    for r in results:
+        if 'store_path' not in r:
+            continue
+        path = Path(r['store_path'])
+        for file in path.parent.glob(path.name + '.*'):
+            try:
+                file.unlink()
+            except OSError:
+                pass
+
+def cleanup(force=False):
+    """
+    Delete sessions older than OUTPUT_TTL_MINUTES, then trim the store to
+    OUTPUT_MAX_MB, oldest files first. Runs at most every
+    CLEANUP_INTERVAL_SECONDS unless forced; errors are ignored.
+    """
+    with _cleanup_lock:
+        now = time.time()
+        if not force and now - _last_cleanup[0] < CLEANUP_INTERVAL_SECONDS:
+            return
+        _last_cleanup[0] = now
+        
+        root = Path(config.OUTPUT_DIR)
+        expired = now - config.OUTPUT_TTL_MINUTES * 60
+        files = []
+        try:
+            sessions = [path for path in root.iterdir() if path.is_dir()]
+        except OSError:
+            return
+        for session in sessions:
+            try:
+                if session.stat().st_mtime < expired:
+                    shutil.rmtree(session, ignore_errors=True)
+                    continue
+                for path in session.iterdir():
+                    stat = path.stat()
+                    files.append((stat.st_mtime, stat.st_size, path))
+            except OSError:
+                continue
+        
+        total = sum(size for _, size, _ in files)
+        max_bytes = config.OUTPUT_MAX_MB * 1024 * 1024
+        for _, size, path in sorted(files):
+            if total <= max_bytes:
+                break
+            try:
+                path.unlink()
+                total -= size
+            except OSError:
+                pass
+
+def _session_dir(session_id):
+    return Path(config.OUTPUT_DIR) / session_id
+
+def _write_atomic(path, data):
+    """Write bytes via a temp file in the same directory, so readers never see half a file."""
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix='.tmp')
+    with os.fdopen(fd, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+def _transactions_size(transactions):
+    """Approximate bytes held by a list of Transaction records and their values."""
+    getsizeof = sys.getsizeof
+    total = getsizeof(transactions)
+    for tx in transactions:
+        total += getsizeof(tx)
+        for name in FIELDS:
+            total += getsizeof(getattr(tx, name))
+    return total
@@ -0,0 +1,86 @@
+"""
+Transaction model
+=================
+One izvod row as a compact record, shared by the parse, BEX expansion,
+debit/credit and export stages. __slots__ instead of a per-row dict, and
+amounts in integer para (cents), so totals are exact and a 100k-row izvod
+costs a fraction of the memory.
+
+Claude's JSON (and the parse cache) still carries plain dicts with RSD
+amounts; as_transactions() turns them into records at the end of parsing.
+"""
+
+# Record fields, in the order of the bank statement columns
+FIELDS = (
+    'date', 'customer_name', 'customer_address', 'customer_account', 'customer_tax_number',
+    'reference', 'currency', 'debit', 'credit', 'description',
+)
+
+class Transaction:
+    """
+    One transaction. Text fields are str, debit/credit integer para (cents);
+    get(name) reads a field by name like the dicts it replaces.
+    """
+    __slots__ = FIELDS
+    
+    def __init__(self, date='', customer_name='', customer_address='', customer_account='',
+                 customer_tax_number='', reference='', currency='RSD', debit=0, credit=0, description=''):
+        self.date = date
+        self.customer_name = customer_name
+        self.customer_address = customer_address
+        self.customer_account = customer_account
+        self.customer_tax_number = customer_tax_number
+        self.reference = reference
+        self.currency = currency
+        self.debit = debit
+        self.credit = credit
+        self.description = description
+    
+    def get(self, name, default=None):
+        """Field by name (e.g. from a rules table), default for unknown names."""
+        return getattr(self, name, default)
+    
+    def to_dict(self):
+        """Plain dict with RSD amounts - the shape of Claude's JSON."""
+        data = {name: getattr(self, name) for name in FIELDS}
+        data['debit'] = self.debit / 100
+        data['credit'] = self.credit / 100
+        return data
+    
+    def __eq__(self, other):
+        if not isinstance(other, Transaction):
+            return NotImplemented
+        return all(getattr(self, name) == getattr(other, name) for name in FIELDS)
+    
+    def __repr__(self):
+        return (f"Transaction({self.date!r}, {self.customer_name!r}, "
+                f"debit={format_cents(self.debit)}, credit={format_cents(self.credit)})")
+
+def to_cents(amount):
+    """Amount in RSD (number or numeric string) -> integer para (cents)."""
+    return int(round(float(amount or 0) * 100))
+
+def format_cents(cents):
+    """Integer para -> '1234.56', exactly (no float rounding)."""
+    sign = '-' if cents < 0 else ''
+    whole, para = divmod(abs(cents), 100)
+    return f"{sign}{whole}.{para:02d}"
+
+def from_dict(data):
+    """Transaction from a dict with RSD amounts (Claude JSON, parse cache)."""
+    return Transaction(
+        date=str(data.get('date') or ''),
+        customer_name=str(data.get('customer_name') or ''),
+        customer_address=str(data.get('customer_address') or ''),
+        customer_account=str(data.get('customer_account') or ''),
+        customer_tax_number=str(data.get('customer_tax_number') or ''),
+        reference=str(data.get('reference') or ''),
+        currency=str(data.get('currency') or 'RSD'),
+        debit=to_cents(data.get('debit')),
+        credit=to_cents(data.get('credit')),
+        description=str(data.get('description') or ''),
+    )
+
+def as_transactions(items):
+    """List of Transaction records from records and/or dicts."""
+    return [tx if isinstance(tx, Transaction) else from_dict(tx) for tx in items]
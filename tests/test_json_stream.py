@@ -0,0 +1,64 @@
+"""Items streamed by iter_json_array_items must equal the array json.loads() finds in the full response."""
+
+import json
+import random
+
+import pytest
+
+from minimax.claude import iter_json_array_items
+
+TRANSACTIONS = [
+    {'date': '05.03.2026', 'customer_name': 'Kupac "Navodnik" d.o.o.', 'debit': 0, 'credit': 1200.5},
+    {'date': '05.03.2026', 'customer_name': 'Back\\slash \\"', 'description': 'kraj\\', 'debit': 10},
+    {'customer_name': 'Zagrade { [ } ] u tekstu', 'description': '"}]},{"x": [', 'credit': 1},
+    {'customer_name': 'Ugnježdeno', 'details': {'a': [1, [2, 3], {'b': '}'}], 'c': {}}, 'tags': []},
+    {'customer_name': 'Unicode ŠĐČĆŽ 🚚  ', 'description': 'red 1\nred 2\ttab', 'credit': 2},
+]
+
+CASES = {
+    'special-characters': json.dumps({'statement': {'number': '5'}, 'transactions': TRANSACTIONS},
+                                     ensure_ascii=False),
+    'ascii-escapes': json.dumps({'statement': {}, 'transactions': TRANSACTIONS}),
+    'empty-array': '{"statement": {"number": "1"}, "transactions": []}',
+    'empty-array-whitespace': '{"transactions" :  [\n  ]\n}',
+    'keys-after-array': json.dumps({'transactions': TRANSACTIONS[:2], 'statement': {'x': ['}']}},
+                                   indent=2),
+    'code-fence': "Evo rezultata:\n```json\n" + json.dumps(
+        {'statement': {'owner_name': 'A [B] {C}'}, 'transactions': TRANSACTIONS}, indent=2
+    ) + "\n```\n",
+    'key-inside-string': json.dumps({'statement': {'owner_name': '"transactions": [{"x": 1}]'},
+                                     'transactions': TRANSACTIONS[:1]}),
+    'nested-arrays': '{"transactions": [{"a": [[1, 2], [3, [4]]]}, {"b": [[]]}]}',
+}
+
+
+def expected_items(text):
+    """The array under 'transactions' in the complete (unfenced) response."""
+    start, end = text.index('{'), text.rindex('}')
+    return json.loads(text[start:end + 1])['transactions']
+
+
+def splits(text, rnd):
+    """Chunkings of text: fixed sizes 1..7, then random cuts."""
+    for size in range(1, 8):
+        yield [text[i:i + size] for i in range(0, len(text), size)]
+    for _ in range(20):
+        cuts = sorted(rnd.sample(range(1, len(text)), min(len(text) - 1, rnd.randint(1, 12))))
+        yield [text[a:b] for a, b in zip([0] + cuts, cuts + [len(text)])]
+
+
+@pytest.mark.parametrize('name', list(CASES))
+def test_items_match_json_loads(name):
+    text = CASES[name]
+    expected = expected_items(text)
+    for chunks in splits(text, random.Random(7)):
+        assert list(iter_json_array_items(iter(chunks), 'transactions')) == expected
+
+
+def test_whole_response_in_one_chunk():
+    text = CASES['special-characters']
+    assert list(iter_json_array_items(iter([text]), 'transactions')) == TRANSACTIONS
+
+
+def test_missing_key_yields_nothing():
+    assert list(iter_json_array_items(iter(['{"statement": {}}']), 'transactions')) == []
@@ -0,0 +1,84 @@
+"""Normalization must keep every transaction line and drop only repeated letterheads, headers and footers."""
+
+from collections import Counter
+
+import pytest
+
+from minimax.normalize import normalize_pages
+
+PAGES = 3
+ROWS_PER_PAGE = 8
+
+LETTERHEAD = [
+    "BANKA INTESA AD BEOGRAD",
+    "Milentija Popovića 7b, 11070 Novi Beograd",
+    "IZVOD BROJ 5 za račun 160-0000000123456-78",
+    "Datum Primalac/Platilac Račun Poziv na broj Opis Duguje Potražuje",
+]
+
+
+def footer(page):
+    return ["Banka Intesa - www.bancaintesa.rs", f"Strana {page} od {PAGES}"]
+
+
+def transaction(n, counterparty):
+    """One multi-line transaction: date, counterparty, account, reference, description, amount."""
+    return [
+        "05.03.2026",
+        counterparty,
+        f"160-0000000{n:06d}-67",
+        f"97 {1000000 + n}",
+        "UPLATA PAZARA",
+        f"{1 + n % 9}.{n % 1000:03d},00",
+    ]
+
+
+def make_pages():
+    """Page texts and the transaction lines on them, in order."""
+    pages, rows = [], []
+    for page in range(1, PAGES + 1):
+        lines = list(LETTERHEAD)
+        for i in range(ROWS_PER_PAGE):
+            n = (page - 1) * ROWS_PER_PAGE + i
+            # Pages 2+ start with the same counterparty on the same date,
+            # right under the letterhead
+            counterparty = "BEX EXPRESS DOO" if page > 1 and i == 0 else f"KUPAC {n}"
+            row = transaction(n, counterparty)
+            rows.extend(row)
+            lines.extend(row)
+        lines.extend(footer(page))
+        pages.append("\n".join(lines) + "\n\n")
+    return pages, rows
+
+
+@pytest.fixture(scope='module')
+def normalized():
+    pages, rows = make_pages()
+    result, stats = normalize_pages(pages, drop_sections=False)
+    lines = Counter(line for page in result for line in page.splitlines() if line)
+    return lines, rows, stats
+
+
+def test_keeps_every_transaction_line(normalized):
+    lines, rows, _ = normalized
+    for line, count in Counter(rows).items():
+        assert lines[line] == count, line
+
+
+def test_repeated_furniture_kept_once(normalized):
+    lines, _, _ = normalized
+    for line in LETTERHEAD[:2] + LETTERHEAD[3:] + footer(1)[:1]:
+        assert lines[line] == 1, line
+    assert sum(count for line, count in lines.items() if line.startswith("Strana ")) == 1
+
+
+def test_account_lines_never_dropped(normalized):
+    lines, _, _ = normalized
+    # The letterhead line with the owner's account is on every page
+    assert lines[LETTERHEAD[2]] == PAGES
+
+
+def test_text_shrinks(normalized):
+    _, _, stats = normalized
+    assert stats['tokens_after'] < stats['tokens_before']
+    assert stats['lines_after'] < stats['lines_before']
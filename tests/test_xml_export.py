@@ -0,0 +1,119 @@
+"""The streamed Minimax XML export must stay byte-identical to the ElementTree build it replaced."""
+
+import io
+import xml.etree.ElementTree as ET
+
+import pytest
+
+from minimax.export import create_minimax_xml, format_account_number, write_minimax_xml
+from minimax.transaction import Transaction, format_cents
+
+STATEMENT = {'date': '17.02.2026', 'account': '265000000012345678', 'number': '42',
+             'owner_name': 'FIRMA DOO', 'owner_address': 'BEOGRAD'}
+
+SPECIAL = Transaction(
+    date='05.03.2026',
+    customer_name='"Kupac" & <Sin> d.o.o. \'Beograd\'',
+    customer_address='Ulica 1\nStan 2\r\n\tulaz B',
+    customer_account='160000000001234567',
+    reference='97 <1&2> "3"',
+    debit=0,
+    credit=123456,
+    description='Plaćanje ŠĐČĆŽ > 100% ]]> <!-- 🚚',
+)
+
+
+def reference_xml(statement, transactions):
+    """create_minimax_xml() as it was: a full ElementTree, indented, serialized at once (amounts in para)."""
+    account_no_dashes = format_account_number(statement.get('account', '')).replace('-', '')
+    dugovni = sum(tx.debit for tx in transactions)
+    potrazni = sum(tx.credit for tx in transactions)
+
+    root = ET.Element('TransakcioniRacunPrivredaIzvod')
+    zaglavlje = ET.SubElement(root, 'Zaglavlje')
+    for name, value in [
+        ('VrstaIzvoda', 'R'),
+        ('BrojIzvoda', statement.get('number', '')),
+        ('DatumIzvoda', statement.get('date', '')),
+        ('MaticniBroj', '4167520394'),
+        ('KomitentNaziv', statement.get('owner_name', '')),
+        ('KomitentAdresa', statement.get('owner_address', '')),
+        ('KomitentMesto', '11010 BEOGRAD-VOŽDOVAC'),
+        ('Partija', account_no_dashes),
+        ('TipRacuna', 'Transakcioni depoziti preduzetnika'),
+        ('PrethodnoStanje', format_cents(dugovni + potrazni)),
+        ('DugovniPromet', format_cents(dugovni)),
+        ('PotrazniPromet', format_cents(potrazni)),
+        ('NovoStanje', format_cents(potrazni - dugovni)),
+        ('StanjeObracunateProvizije', '0'),
+    ]:
+        zaglavlje.set(name, value)
+
+    for tx in transactions:
+        stavka = ET.SubElement(root, 'Stavke')
+        for name, value in [
+            ('NalogKorisnik', tx.customer_name),
+            ('Mesto', tx.customer_address),
+            ('VasBrojNaloga', ''),
+            ('BrojRacunaPrimaocaPosiljaoca',
+             format_account_number(tx.customer_account) if tx.customer_account else ''),
+            ('Opis', tx.description),
+            ('SifraPlacanja', ''),
+            ('SifraPlacanjaOpis', ''),
+            ('Duguje', format_cents(tx.debit)),
+            ('Potrazuje', format_cents(tx.credit)),
+            ('ModelZaduzenjaOdobrenja', ''),
+            ('PozivNaBrojZaduzenjaOdobrenja', ''),
+            ('ModelKorisnika', ''),
+            ('PozivNaBrojKorisnika', tx.reference),
+            ('BrojZaReklamaciju', ''),
+            ('Referenca', tx.reference),
+            ('Objasnjenje', ''),
+            ('DatumValute', tx.date),
+        ]:
+            stavka.set(name, value)
+
+    tree = ET.ElementTree(root)
+    ET.indent(tree, space="  ", level=0)
+    output = io.BytesIO()
+    tree.write(output, encoding='utf-8', xml_declaration=True)
+    return output.getvalue()
+
+
+def make_transactions(rows):
+    for i in range(rows):
+        yield Transaction(
+            date=f'{1 + i % 28:02d}.02.2026',
+            customer_name=f'KUPAC {i}',
+            customer_address=f'MESTO {i % 50}',
+            customer_account='160000000001234567' if i % 3 else '',
+            reference=f'97 {i}',
+            debit=0 if i % 4 else 10_000 + i,
+            credit=100_050 + i if i % 4 else 0,
+            description='Uplata po računu',
+        )
+
+
+@pytest.mark.parametrize('statement, transactions', [
+    (STATEMENT, [SPECIAL]),
+    (STATEMENT, list(make_transactions(50))),
+    (STATEMENT, []),
+    ({}, []),
+    ({'number': '1 & 2', 'owner_name': 'FIRMA "X" <DOO>', 'owner_address': 'Adresa\nred 2',
+      'account': '160-123-45'}, [Transaction(), SPECIAL]),
+], ids=['special-characters', 'generated', 'no-transactions', 'empty-statement', 'special-header'])
+def test_matches_elementtree(statement, transactions):
+    assert create_minimax_xml(statement, iter(transactions)) == reference_xml(statement, transactions)
+
+
+def test_newlines_read_back():
+    root = ET.fromstring(create_minimax_xml(STATEMENT, [SPECIAL]))
+    stavka = root.find('Stavke')
+    assert stavka.get('NalogKorisnik') == SPECIAL.customer_name
+    assert stavka.get('Mesto') == SPECIAL.customer_address
+
+
+def test_writes_to_file_object():
+    out = io.BytesIO()
+    write_minimax_xml(STATEMENT, make_transactions(10), out)
+    assert out.getvalue() == reference_xml(STATEMENT, list(make_transactions(10)))
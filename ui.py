@@ -0,0 +1,226 @@
+"""
+Streamlit helpers for app.py
+============================
+Panels and small helpers of the UI. They live in a module rather than in
+app.py because Streamlit re-executes app.py on every interaction: this
+module is imported once per process, after login, together with the
+minimax package.
+"""
+
+import collections
+import hashlib
+from datetime import date, timedelta
+from functools import partial
+
+import streamlit as st
+
+from minimax import config, jobs, ledger, metrics, store
+from minimax.export import format_account_number
+from minimax.pipeline import convert_uploads, izvod_output
+
+# Finished runs kept in session state (converted izvodi + files rendered so far)
+KEPT_RUNS = 4
+
+# How often the page asks a running job for its progress
+JOB_POLL_SECONDS = 1.0
+
+def uploads_key(izvodi_files, spec_files, chunked, use_ledger, use_cache, batch_mode):
+    """Identity of the current inputs: content hash of every upload plus the
+    options that decide how they are converted."""
+    h = hashlib.sha256()
+    for group in (izvodi_files or [], spec_files or []):
+        for f in group:
+            h.update(f.name.encode('utf-8') + b'\0')
+            h.update(hashlib.sha256(f.getvalue()).digest())
+        h.update(b'|')
+    h.update(b'chunked' if chunked else b'whole')
+    h.update(b'ledger' if use_ledger else b'fresh')
+    h.update(b'cache' if use_cache else b'no-cache')
+    h.update(b'batch' if batch_mode else b'direct')
+    return h.hexdigest()
+
+def store_session():
+    """This session's id in the output store, kept alive (TTL reset) on every rerun."""
+    if 'store_session' not in st.session_state:
+        st.session_state.store_session = store.new_session()
+    store.touch(st.session_state.store_session)
+    return st.session_state.store_session
+
+def download_data(converted, output_format, records):
+    """
+    Data for a download button, read back from disk only when the button is
+    clicked. The job renders its own format; a file in another format (the
+    user switched after the run) is rendered here on first display, the
+    export stage added to the run's metrics.
+    """
+    if output_format not in converted['outputs']:
+        with metrics.collect(records):
+            izvod_output(converted, output_format)
+    return partial(izvod_output, converted, output_format)
+
+def conversion_work(all_uploads, spec_uploads, session_id, output_format, streaming=True, **options):
+    """
+    work(job) for jobs.submit(): convert_uploads() on a worker thread,
+    reporting into the job, each result kept in the session's output store
+    and rendered to output_format as it is ready, so the page only reads
+    files back. options: convert_uploads() keyword arguments.
+    """
+    def work(job):
+        def on_transaction(i, tx):
+            if tx is None:
+                # A cut-off response is parsed again - its rows were incomplete
+                kept = [row for row in job.live_rows if row['Fajl'] != all_uploads[i][0]]
+                job.live_rows = collections.deque(kept, maxlen=job.live_rows.maxlen)
+                return
+            # Rows streamed from Claude - shown before the file is done
+            job.live_rows.append({
+                'Fajl': all_uploads[i][0],
+                'Datum': tx.get('date', ''),
+                'Kupac': str(tx.get('customer_name', ''))[:40],
+                'Duguje': tx.get('debit', 0),
+                'Potražuje': tx.get('credit', 0),
+            })
+        
+        def on_result(result):
+            if result['success']:
+                store.keep(result, session_id)
+                try:
+                    izvod_output(result, output_format)
+                except Exception as e:
+                    store.discard([result])
+                    result = {'success': False, 'filename': result['filename'],
+                              'error': f"{output_format} fajl nije napravljen: {e}"}
+            job.results.append(result)
+        
+        convert_uploads(
+            all_uploads, spec_uploads, on_message=job.message, on_progress=job.set_progress,
+            on_file=job.set_file, on_transaction=on_transaction if streaming else None,
+            on_result=on_result, **options
+        )
+        store.enforce_memory_cap(job.results)
+    
+    return work
+
+@st.fragment(run_every=JOB_POLL_SECONDS)
+def show_job_progress(job_id):
+    """
+    Live view of a queued or running job, redrawn every JOB_POLL_SECONDS
+    without rerunning the page; reruns the page once the job is finished.
+    """
+    job = jobs.get(job_id)
+    if job is None or not job.active:
+        st.rerun()
+    
+    if job.status == 'queued':
+        ahead = jobs.position(job)
+        st.info(f"⏳ Obrada čeka u redu ({ahead} pre nje). Stranica se može zatvoriti - "
+                f"rezultat ostaje na ovom linku.")
+        return
+    
+    done, total, text = job.progress
+    streamed = sum(status for status in list(job.files.values()) if isinstance(status, int))
+    if streamed:
+        text += f" - primljeno {streamed} transakcija"
+    st.progress(done / total if total else 0.0, text=text or "Parsiram izvode...")
+    
+    filenames = job.data['filenames']
+    for index, status in sorted(list(job.files.items())):
+        if status == 'done':
+            st.markdown(f"✅ {filenames[index]}")
+        elif status == 'error':
+            st.markdown(f"❌ {filenames[index]}")
+        elif status == 'parsing':
+            st.markdown(f"⏳ {filenames[index]}")
+        else:
+            st.markdown(f"⏳ {filenames[index]} - {status} transakcija")
+    
+    for kind, message in list(job.messages):
+        getattr(st, kind)(message)
+    
+    if job.live_rows:
+        st.dataframe(list(job.live_rows), use_container_width=True, hide_index=True)
+    
+    # Izvodi already converted, while the rest are still in the works
+    for r in list(job.results):
+        if r['success']:
+            st.markdown(f"📄 Gotovo: {r['filename']} - {len(r['transactions'])} transakcija")
+        else:
+            st.error(f"GRESKA {r['filename']}: {r['error']}")
+
+def show_session_memory(usage):
+    """One line on what the session holds in memory (vs. its cap) and on disk."""
+    spilled = f" · {usage['spilled']} izvoda premešteno na disk" if usage['spilled'] else ""
+    st.caption(f"💾 Memorija sesije: {usage['memory_bytes'] / 2**20:.1f} MB od "
+               f"{usage['cap_bytes'] / 2**20:.0f} MB{spilled} · na disku {usage['disk_bytes'] / 2**20:.1f} MB")
+
+def show_metrics_panel(records):
+    """Expandable per-stage breakdown of a run: wall time, tokens, bytes, rows."""
+    if not records:
+        return
+    import pandas as pd
+    
+    with st.expander("⏱️ Merenja po fazama"):
+        summary = metrics.summarize(records)
+        st.dataframe(
+            pd.DataFrame([
+                {
+                    'Faza': name,
+                    'Broj': totals['count'],
+                    'Vreme (s)': round(totals['seconds'], 3),
+                    'Tokeni ulaz': totals['tokens_in'],
+                    'Tokeni izlaz': totals['tokens_out'],
+                    'Bajtova': totals['bytes'],
+                    'Redova': totals['rows'],
+                }
+                for name, totals in summary.items()
+            ]),
+            use_container_width=True, hide_index=True
+        )
+        st.markdown("Pojedinačna merenja:")
+        st.dataframe(pd.DataFrame(records), use_container_width=True, hide_index=True)
+
+def show_ledger_panel():
+    """
+    List of statements in the ledger, filtered by date and account. Shown on
+    demand only - a collapsed expander would still query the database and
+    load pandas on every rerun.
+    """
+    if not config.LEDGER_PATH or not st.toggle("📚 Prikaži obrađene izvode (baza)", key='ledger_panel'):
+        return
+    import pandas as pd
+    
+    with st.container(border=True):
+        col_from, col_to, col_account = st.columns(3)
+        with col_from:
+            date_from = st.date_input("Od", value=date.today() - timedelta(days=92), key='ledger_from')
+        with col_to:
+            date_to = st.date_input("Do", value=date.today(), key='ledger_to')
+        with col_account:
+            account = st.text_input("Račun (opciono)", key='ledger_account')
+        
+        statements = ledger.list_statements(account.strip() or None, date_from, date_to)
+        if not statements:
+            st.info("Nema obrađenih izvoda u izabranom periodu.")
+            return
+        
+        st.dataframe(
+            pd.DataFrame([
+                {
+                    'Datum': s['day'],
+                    'Račun': format_account_number(s['account']),
+                    'Broj izvoda': s['number'],
+                    'Fajl': s['filename'],
+                    'Transakcija': s['transactions'],
+                    'Duguje': s['debit'] / 100,
+                    'Potražuje': s['credit'] / 100,
+                    'BEX razbijen': bool(s['bex_expanded']),
+                    'Obrađen': s['processed_at'],
+                }
+                for s in statements
+            ]),
+            use_container_width=True, hide_index=True
+        )
+        total_debit = sum(s['debit'] for s in statements) / 100
+        total_credit = sum(s['credit'] for s in statements) / 100
+        st.markdown(f"**{len(statements)} izvoda** - duguje {total_debit:,.2f} RSD, "
+                    f"potražuje {total_credit:,.2f} RSD")